@@ -0,0 +1,75 @@
+"""
+Compare the character chunker (chunk_text) with the token-aware chunker
+
+Reports, per PDF: chunks per document, token count spread, the share of
+chunks the embedding model truncates, and the time to encode all chunks.
+
+Usage (from backend/):
+    python -m benchmarks.bench_chunking paper.pdf [more.pdf ...]
+"""
+
+import argparse
+import statistics
+import time
+from typing import Dict, List
+
+import config
+from benchmarks.legacy import chunk_text, extract_pdf
+from chunking import iter_token_chunks
+from embedding_service import EmbeddingService
+
+
+def describe(service: EmbeddingService, chunks: List[str]) -> Dict[str, float]:
+    token_counts = [len(ids) for ids in service.tokenizer(chunks, add_special_tokens=False)["input_ids"]]
+    truncated = sum(1 for count in token_counts if count > service.max_tokens)
+
+    started = time.perf_counter()
+    service.encode_batch(chunks)
+    encode_seconds = time.perf_counter() - started
+
+    return {
+        "chunks": len(chunks),
+        "mean_tokens": statistics.mean(token_counts),
+        "stdev_tokens": statistics.pstdev(token_counts),
+        "truncated_pct": 100 * truncated / len(chunks),
+        "encode_seconds": encode_seconds,
+    }
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="+", help="PDF files to chunk")
+    parser.add_argument("--max-tokens", type=int, default=config.CHUNK_MAX_TOKENS)
+    parser.add_argument("--overlap-tokens", type=int, default=config.CHUNK_OVERLAP_TOKENS)
+    args = parser.parse_args(argv)
+
+    service = EmbeddingService(batch_window_ms=0)
+    service.encode_batch(["warm-up"])
+
+    print(f"{'file':30} {'chunker':8} {'chunks':>7} {'mean tok':>9} {'stdev':>7} {'trunc %':>8} {'encode s':>9}")
+    for path in args.pdfs:
+        with open(path, "rb") as handle:
+            document = extract_pdf(handle.read())
+
+        variants = {
+            "chars": chunk_text(document.full_text),
+            "tokens": [
+                chunk.text
+                for chunk in iter_token_chunks(
+                    document.pages,
+                    service.tokenizer,
+                    max_tokens=min(args.max_tokens, service.max_tokens),
+                    overlap_tokens=args.overlap_tokens,
+                )
+            ],
+        }
+        for name, chunks in variants.items():
+            stats = describe(service, chunks)
+            print(
+                f"{path[-30:]:30} {name:8} {stats['chunks']:>7} {stats['mean_tokens']:>9.1f} "
+                f"{stats['stdev_tokens']:>7.1f} {stats['truncated_pct']:>8.1f} {stats['encode_seconds']:>9.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
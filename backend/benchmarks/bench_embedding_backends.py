@@ -0,0 +1,103 @@
+"""
+Parity check and CPU throughput/latency benchmark for the embedding backends
+
+Compares the ONNX Runtime backend (fp32 and int8 quantized) with the PyTorch
+vectors the service has produced so far. Exits non-zero when a backend's
+cosine similarity to the PyTorch vectors drops below --min-cosine.
+
+Usage (from backend/):
+    python -m benchmarks.bench_embedding_backends [--pdf paper.pdf] [--texts 256] [--model path/or/hub-id]
+
+``--model`` must provide ``onnx/model.onnx`` and ``onnx/model_quint8_avx2.onnx``
+like the Hub repository does.
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from benchmarks.legacy import chunk_text, extract_pdf
+from embedding_service import EMBEDDING_MODEL_NAME, EmbeddingService
+
+
+def sample_texts(pdf_path: str, count: int) -> List[str]:
+    if pdf_path:
+        with open(pdf_path, "rb") as handle:
+            chunks = chunk_text(extract_pdf(handle.read()).full_text)
+    else:
+        chunks = [
+            f"Section {index}. We evaluate retrieval-augmented generation on research papers, "
+            f"measuring answer faithfulness and latency under configuration {index}."
+            for index in range(count)
+        ]
+    return (chunks * (count // max(1, len(chunks)) + 1))[:count]
+
+
+def cosine_rows(reference: np.ndarray, candidate: np.ndarray) -> np.ndarray:
+    reference = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    candidate = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    return np.einsum("ij,ij->i", reference, candidate)
+
+
+def measure(service: EmbeddingService, texts: List[str], queries: int) -> Dict[str, float]:
+    service.encode_batch(texts[:8])  # warm-up: load weights, build sessions
+
+    started = time.perf_counter()
+    service.encode_batch(texts)
+    batch_seconds = time.perf_counter() - started
+
+    latencies = []
+    for text in texts[:queries]:
+        started = time.perf_counter()
+        service.encode_batch([text])
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+
+    return {
+        "texts_per_second": len(texts) / batch_seconds,
+        "query_p50_ms": statistics.median(latencies),
+        "query_p95_ms": latencies[int(0.95 * (len(latencies) - 1))],
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", default=None, help="take sample chunks from this PDF")
+    parser.add_argument("--texts", type=int, default=256, help="number of texts to encode")
+    parser.add_argument("--queries", type=int, default=50, help="single-text encodes for latency")
+    parser.add_argument("--min-cosine", type=float, default=0.98, help="parity threshold vs PyTorch")
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME, help="Hub id or local directory of the model")
+    args = parser.parse_args(argv)
+
+    texts = sample_texts(args.pdf, args.texts)
+    variants = {
+        "torch": EmbeddingService(args.model, batch_window_ms=0, backend="torch"),
+        "onnx": EmbeddingService(args.model, batch_window_ms=0, backend="onnx"),
+        "onnx-int8": EmbeddingService(args.model, batch_window_ms=0, backend="onnx", onnx_quantized=True),
+    }
+
+    reference = np.asarray(variants["torch"].encode_batch(texts), dtype=np.float32)
+    failed = False
+
+    print(f"{'backend':10} {'texts/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'min cos':>8} {'mean cos':>9}")
+    for name, service in variants.items():
+        timings = measure(service, texts, args.queries)
+        vectors = np.asarray(service.encode_batch(texts), dtype=np.float32)
+        similarities = cosine_rows(reference, vectors)
+        failed |= bool(similarities.min() < args.min_cosine)
+        print(
+            f"{name:10} {timings['texts_per_second']:>9.1f} {timings['query_p50_ms']:>8.2f} "
+            f"{timings['query_p95_ms']:>8.2f} {similarities.min():>8.4f} {similarities.mean():>9.4f}"
+        )
+
+    if failed:
+        print(f"Parity check failed: a backend is below cosine {args.min_cosine}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
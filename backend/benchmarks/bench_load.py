@@ -0,0 +1,238 @@
+"""
+Offline load test: concurrent uploads and questions against the in-process app
+
+Chroma is replaced by an in-memory ``chromadb.EphemeralClient`` and Gemini
+by a deterministic fake with a fixed latency, so runs need no network and
+are repeatable. The real embedding model is used unless --fake-embeddings
+is given. Per-stage timings come from the Server-Timing headers.
+
+Results are written as JSON named after the current git commit, so two
+commits can be compared with --compare.
+
+Usage (from backend/):
+    python -m benchmarks.bench_load [--documents 8] [--questions 200] [--concurrency 16]
+    python -m benchmarks.bench_load --compare benchmarks/results/<commit>.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+# Keep runs hermetic: no on-disk caches or indexes carried over between runs
+os.environ["EMBEDDING_CACHE_PATH"] = ""
+os.environ["SEARCH_INDEX_PATH"] = ""
+os.environ.pop("REDIS_URL", None)
+
+import httpx
+
+from benchmarks.fakes import install_fake_embeddings, install_fake_gemini, make_pdf
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+QUESTION_TEMPLATES = [
+    "What does page {page} say about {topic}?",
+    "How is {topic} evaluated in this paper?",
+    "Summarise the findings on {topic}.",
+    "Which methods are used for {topic}?",
+    "What are the limitations regarding {topic}?",
+]
+TOPICS = ["retrieval", "transformers", "caching", "latency", "embeddings", "summaries", "evaluation", "indexing"]
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def describe(values: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+        "mean_ms": round(sum(values) / len(values) * 1000, 2),
+    }
+
+
+def parse_server_timing(header: str) -> Dict[str, List[float]]:
+    stages: Dict[str, List[float]] = defaultdict(list)
+    for entry in filter(None, (part.strip() for part in header.split(","))):
+        name, _, params = entry.partition(";")
+        if params.startswith("dur="):
+            stages[name].append(float(params[4:]) / 1000)
+    return stages
+
+
+async def run_phase(client: httpx.AsyncClient, requests: List[dict], concurrency: int) -> dict:
+    """Send ``requests`` with at most ``concurrency`` in flight; summarise latency and stages."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    stages: Dict[str, List[float]] = defaultdict(list)
+    errors = 0
+
+    async def send(request: dict) -> None:
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.request(**request)
+            latencies.append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            errors += 1
+        for stage, durations in parse_server_timing(response.headers.get("server-timing", "")).items():
+            if stage != "total":
+                stages[stage].extend(durations)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(send(request) for request in requests))
+    wall_seconds = time.perf_counter() - started
+
+    return {
+        "requests": len(requests),
+        "errors": errors,
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_rps": round(len(requests) / wall_seconds, 2),
+        "latency": describe(latencies),
+        "stages": {stage: describe(values) for stage, values in sorted(stages.items())},
+    }
+
+
+def upload_requests(documents: int, pages: int) -> List[dict]:
+    return [
+        {
+            "method": "POST",
+            "url": "/documents/upload",
+            "params": {"category": "benchmark"},
+            "files": {"file": (f"paper-{seed}.pdf", make_pdf(pages, seed), "application/pdf")},
+        }
+        for seed in range(documents)
+    ]
+
+
+def question_requests(document_ids: List[str], questions: int, repeat_ratio: float, pages: int, rng: random.Random) -> List[dict]:
+    requests: List[dict] = []
+    for index in range(questions):
+        if requests and rng.random() < repeat_ratio:
+            requests.append(rng.choice(requests))  # exercises the response cache
+            continue
+        question = rng.choice(QUESTION_TEMPLATES).format(page=rng.randrange(pages), topic=rng.choice(TOPICS))
+        requests.append({
+            "method": "POST",
+            "url": "/qa/ask",
+            "json": {
+                "document_id": rng.choice(document_ids),
+                "question": question,
+                "conversation_id": f"bench-{index % 32}",
+            },
+        })
+    return requests
+
+
+def git_revision() -> str:
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+        dirty = subprocess.check_output(["git", "status", "--porcelain", "--untracked-files=no"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{commit}-dirty" if dirty else commit
+
+
+async def run(args: argparse.Namespace) -> dict:
+    install_fake_gemini(args.llm_latency_ms / 1000)
+
+    import chromadb
+
+    import main
+    from cache import content_hash
+    from embedding_service import embedding_service
+    from registry import registry
+
+    registry.use_chroma_client(chromadb.EphemeralClient())
+    if args.fake_embeddings:
+        install_fake_embeddings(embedding_service)
+    await asyncio.to_thread(registry.warm_up)
+    if registry.warm_up_error:
+        raise SystemExit(f"Warm-up failed: {registry.warm_up_error}")
+
+    rng = random.Random(args.seed)
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        uploads = upload_requests(args.documents, args.pages)
+        upload_phase = await run_phase(client, uploads, args.upload_concurrency)
+
+        document_ids = [content_hash(request["files"]["file"][1]) for request in uploads]
+        ask_phase = await run_phase(
+            client,
+            question_requests(document_ids, args.questions, args.repeat_ratio, args.pages, rng),
+            args.concurrency,
+        )
+
+    return {
+        "commit": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "parameters": vars(args),
+        "boot_timings": registry.boot_timings,
+        "phases": {"upload": upload_phase, "ask": ask_phase},
+    }
+
+
+def print_report(results: dict, baseline: Optional[dict] = None) -> None:
+    print(f"commit {results['commit']}" + (f"  (vs {baseline['commit']})" if baseline else ""))
+    for phase_name, phase in results["phases"].items():
+        base_phase = (baseline or {}).get("phases", {}).get(phase_name, {})
+        print(
+            f"\n[{phase_name}] {phase['requests']} requests, {phase['errors']} errors, "
+            f"{phase['throughput_rps']} req/s" + (f" (was {base_phase['throughput_rps']})" if base_phase else "")
+        )
+        rows = [("request", phase["latency"], base_phase.get("latency"))]
+        rows += [(stage, stats, base_phase.get("stages", {}).get(stage)) for stage, stats in phase["stages"].items()]
+        print(f"  {'stage':20} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'Δp50':>8} {'Δp95':>8}")
+        for name, stats, base in rows:
+            delta = (
+                f"{stats['p50_ms'] - base['p50_ms']:>+8.1f} {stats['p95_ms'] - base['p95_ms']:>+8.1f}"
+                if base else f"{'':>8} {'':>8}"
+            )
+            print(
+                f"  {name:20} {stats['count']:>6} {stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} "
+                f"{stats['p99_ms']:>9.1f} {delta}"
+            )
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=8, help="PDFs to upload")
+    parser.add_argument("--pages", type=int, default=12, help="pages per PDF")
+    parser.add_argument("--questions", type=int, default=200, help="questions to ask")
+    parser.add_argument("--repeat-ratio", type=float, default=0.3, help="share of repeated questions")
+    parser.add_argument("--concurrency", type=int, default=16, help="questions in flight")
+    parser.add_argument("--upload-concurrency", type=int, default=4, help="uploads in flight")
+    parser.add_argument("--llm-latency-ms", type=float, default=500, help="fake Gemini latency per call")
+    parser.add_argument("--fake-embeddings", action="store_true", help="use hashed vectors instead of the model")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None, help="result file (default: results/<commit>.json)")
+    parser.add_argument("--compare", default=None, help="earlier result file to diff against")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run(args))
+    baseline = None
+    if args.compare:
+        with open(args.compare) as handle:
+            baseline = json.load(handle)
+    print_report(results, baseline)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{results['commit']}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as handle:
+        json.dump(results, handle, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
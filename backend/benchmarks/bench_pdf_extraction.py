@@ -0,0 +1,72 @@
+"""
+Benchmark PDF text extraction: legacy double parse vs the streaming upload path
+
+The streaming variants run ``pdf_extraction.iter_pdf_pages`` over a mapped
+file, as uploads do: serially, and with windows spread over the process pool.
+
+Usage (from backend/):
+    python -m benchmarks.bench_pdf_extraction paper.pdf [more.pdf ...] --repeat 3
+"""
+
+import argparse
+import io
+import time
+from typing import Callable, List
+
+import PyPDF2
+
+from pdf_extraction import MappedPdf, iter_pdf_pages
+
+
+def legacy_extract(path: str) -> str:
+    """The original upload path: the whole file in memory, two readers and repeated string concatenation."""
+    with open(path, "rb") as handle:
+        pdf_bytes = handle.read()
+    reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+    text = ""
+    for page in reader.pages:
+        text += page.extract_text() + "\n"
+    PyPDF2.PdfReader(io.BytesIO(pdf_bytes)).pages[0].extract_text()
+    return text
+
+
+def stream_extract(path: str, **options) -> int:
+    with MappedPdf(path) as mapped:
+        return sum(1 for _ in iter_pdf_pages(mapped, **options))
+
+
+def time_pages_per_second(func: Callable[[str], object], path: str, pages: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(path)
+        best = min(best, time.perf_counter() - started)
+    return pages / best if best > 0 else float("inf")
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="+", help="PDF files to extract")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per variant; the best run is reported")
+    parser.add_argument("--workers", type=int, default=None, help="process pool size for the parallel variant")
+    args = parser.parse_args(argv)
+
+    def parallel(path: str) -> int:
+        return stream_extract(path, parallel_min_pages=1, workers=args.workers)
+
+    print(f"{'file':40} {'pages':>6} {'legacy p/s':>11} {'serial p/s':>11} {'parallel p/s':>13}")
+    for path in args.pdfs:
+        with MappedPdf(path) as mapped:
+            pages = mapped.page_count
+
+        # Warm the process pool so its start-up cost is not attributed to the first file
+        parallel(path)
+
+        legacy = time_pages_per_second(legacy_extract, path, pages, args.repeat)
+        serial = time_pages_per_second(lambda p: stream_extract(p, workers=1), path, pages, args.repeat)
+        pooled = time_pages_per_second(parallel, path, pages, args.repeat)
+        print(f"{path[-40:]:40} {pages:>6} {legacy:>11.1f} {serial:>11.1f} {pooled:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
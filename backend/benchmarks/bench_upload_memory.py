@@ -0,0 +1,136 @@
+"""
+Peak memory of one upload as the PDF grows: whole-file load vs streaming ingest
+
+For each page count a synthetic PDF is written to disk and ingested twice
+under tracemalloc:
+
+- load_all: what the pipeline held before streaming: the PDF bytes, every
+  page's text, the full text and every chunk record at once (no embedding)
+- streaming: ``ingest_pdf`` on the spooled file (extract, chunk, embed,
+  store and summarise) with a fake Gemini
+
+Chroma writes go to a sink that only counts them and the BM25 index is
+stubbed out: both hold the corpus, not the upload, and would otherwise
+dominate the trace. Extraction runs in-process (PDF_EXTRACT_WORKERS=1) so
+worker processes do not hide allocations. The embedding model is loaded
+before tracing starts.
+
+Usage (from backend/):
+    python -m benchmarks.bench_upload_memory [--pages 25 100 400] [--fake-embeddings]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+os.environ["EMBEDDING_CACHE_PATH"] = ""
+os.environ["SEARCH_INDEX_PATH"] = ""
+os.environ["PDF_EXTRACT_WORKERS"] = "1"
+os.environ.pop("REDIS_URL", None)
+
+from benchmarks.fakes import install_fake_embeddings, install_fake_gemini, make_pdf
+
+MB = 1024 * 1024
+
+
+class DiscardCollection:
+    """Chroma collection stand-in that counts writes and stores nothing."""
+
+    def __init__(self):
+        self.records = 0
+
+    def add(self, ids, **kwargs) -> None:
+        self.records += len(ids)
+
+    upsert = add
+
+    def get(self, **kwargs) -> dict:
+        return {"ids": [], "documents": [], "metadatas": []}
+
+    def count(self) -> int:
+        return self.records
+
+
+class DiscardClient:
+    def __init__(self):
+        self.collections = {}
+
+    def heartbeat(self) -> int:
+        return 0
+
+    def get_or_create_collection(self, name: str) -> DiscardCollection:
+        return self.collections.setdefault(name, DiscardCollection())
+
+
+def traced_peak(func: Callable[[], object]) -> Tuple[float, float]:
+    """Peak traced allocation (MB) while ``func`` runs, and its wall time."""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    started = time.perf_counter()
+    try:
+        func()
+    finally:
+        seconds = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return peak / MB, seconds
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[25, 100, 400])
+    parser.add_argument("--lines-per-page", type=int, default=60)
+    parser.add_argument("--fake-embeddings", action="store_true", help="use hashed vectors instead of the model")
+    args = parser.parse_args(argv)
+
+    install_fake_gemini(0)
+
+    from cache import file_content_hash
+    from embedding_service import embedding_service
+    from benchmarks.legacy import extract_pdf
+    from registry import registry
+    from routes.documents import document_metadata, ingest_pdf, iter_chunk_records
+    from search_index import search_index
+
+    registry.use_chroma_client(DiscardClient())
+    search_index.add_many = lambda records: 0
+    if args.fake_embeddings:
+        install_fake_embeddings(embedding_service)
+    registry.warm_up()
+
+    print(f"{'pages':>6} {'pdf MB':>8} {'load_all MB':>12} {'streaming MB':>13} {'streaming s':>12}")
+    for seed, pages in enumerate(args.pages):
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as handle:
+            handle.write(make_pdf(pages, seed, lines_per_page=args.lines_per_page))
+            path = handle.name
+        try:
+            document_id = file_content_hash(path)
+
+            def load_all() -> None:
+                with open(path, "rb") as pdf_file:
+                    pdf_content = pdf_file.read()
+                document = extract_pdf(pdf_content, workers=1)
+                metadata = document_metadata(
+                    document_id, "bench.pdf", len(pdf_content), document.page_count, datetime.utcnow()
+                )
+                records = list(iter_chunk_records(document_id, document.pages, metadata))
+                assert records and document.full_text
+
+            load_all_mb, _ = traced_peak(load_all)
+            streaming_mb, streaming_seconds = traced_peak(
+                lambda: ingest_pdf(path, "bench.pdf", document_id=document_id)
+            )
+            print(
+                f"{pages:>6} {os.path.getsize(path) / MB:>8.2f} {load_all_mb:>12.1f} "
+                f"{streaming_mb:>13.1f} {streaming_seconds:>12.2f}"
+            )
+        finally:
+            os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Deterministic local stand-ins for Gemini, the embedding model and test PDFs
+
+Used by the load benchmark so the whole pipeline runs without network
+access. Install them before the app handles its first request.
+"""
+
+import asyncio
+import hashlib
+import json
+import re
+import time
+import zlib
+from types import SimpleNamespace
+from typing import List, Sequence
+
+import numpy as np
+
+WORD = re.compile(r"\S+")
+
+FAKE_SUMMARY = {
+    "title_and_authors": {"title": "Title & Authors", "content": "A synthetic benchmark paper by the load generator."},
+    "abstract": {"title": "Abstract", "content": "We measure retrieval-augmented question answering under load."},
+    "problem_statement": {"title": "Problem Statement", "content": "Latency grows with concurrent uploads and questions."},
+    "methodology": {"title": "Methodology", "content": "Synthetic documents are uploaded and queried concurrently."},
+    "key_results": {"title": "Key Results", "content": "Per-stage percentiles are reported for every run."},
+    "conclusion": {"title": "Conclusion", "content": "Results are comparable across commits."},
+}
+
+
+def _usage(prompt: str, answer: str) -> SimpleNamespace:
+    prompt_tokens = len(prompt) // 4
+    completion_tokens = len(answer) // 4
+    return SimpleNamespace(
+        prompt_token_count=prompt_tokens,
+        candidates_token_count=completion_tokens,
+        total_token_count=prompt_tokens + completion_tokens,
+    )
+
+
+class FakeGenerativeModel:
+    """Drop-in for ``genai.GenerativeModel`` with a fixed latency and deterministic output."""
+
+    latency_seconds = 0.5
+    stream_chunks = 8
+
+    def __init__(self, model_name: str, **kwargs):
+        self.model_name = model_name
+
+    def _answer(self, prompt: str) -> str:
+        if "research paper analyzer" in prompt:
+            return json.dumps(FAKE_SUMMARY)
+        question = prompt.rsplit("Question:", 1)[-1].split("\n", 1)[0].strip()
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+        return f"Based on the provided context, the answer to '{question}' is discussed in the paper ({digest})."
+
+    def _response(self, prompt: str, text: str) -> SimpleNamespace:
+        return SimpleNamespace(text=text, usage_metadata=_usage(prompt, text))
+
+    def _pieces(self, text: str) -> List[str]:
+        size = max(1, -(-len(text) // self.stream_chunks))
+        return [text[start : start + size] for start in range(0, len(text), size)]
+
+    def generate_content(self, prompt: str, generation_config=None, stream: bool = False, **kwargs):
+        time.sleep(self.latency_seconds)
+        text = self._answer(prompt)
+        if stream:
+            return iter([self._response(prompt, piece) for piece in self._pieces(text)])
+        return self._response(prompt, text)
+
+    async def generate_content_async(self, prompt: str, generation_config=None, stream: bool = False, **kwargs):
+        text = self._answer(prompt)
+        if not stream:
+            await asyncio.sleep(self.latency_seconds)
+            return self._response(prompt, text)
+
+        pieces = self._pieces(text)
+
+        async def chunks():
+            for piece in pieces:
+                await asyncio.sleep(self.latency_seconds / len(pieces))
+                yield self._response(prompt, piece)
+
+        return chunks()
+
+
+def install_fake_gemini(latency_seconds: float) -> None:
+    """Route every ``genai.GenerativeModel`` call to ``FakeGenerativeModel``."""
+    import google.generativeai as genai
+
+    FakeGenerativeModel.latency_seconds = latency_seconds
+    genai.GenerativeModel = FakeGenerativeModel
+
+
+class FakeTokenizer:
+    """Whitespace tokenizer with the call shapes the chunker uses."""
+
+    def __call__(self, texts, add_special_tokens: bool = True, return_offsets_mapping: bool = False):
+        if isinstance(texts, str):
+            matches = list(WORD.finditer(texts))
+            encoding = {"input_ids": [zlib.crc32(match.group().encode()) for match in matches]}
+            if return_offsets_mapping:
+                encoding["offset_mapping"] = [match.span() for match in matches]
+            return encoding
+        return {"input_ids": [[zlib.crc32(word.encode()) for word in WORD.findall(text)] for text in texts]}
+
+
+class FakeEncoder:
+    """Hashed bag-of-words vectors: deterministic, and similar texts get similar vectors."""
+
+    max_seq_length = 384
+
+    def __init__(self, dimensions: int = 768):
+        self.dimensions = dimensions
+        self.tokenizer = FakeTokenizer()
+
+    def encode(self, texts: Sequence[str], batch_size: int = 32, **kwargs) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in WORD.findall(text.lower()):
+                vectors[row, zlib.crc32(word.encode()) % self.dimensions] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+
+def install_fake_embeddings(service) -> None:
+    service._model = FakeEncoder()
+
+
+def _pdf_text(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages: int, seed: int, lines_per_page: int = 40) -> bytes:
+    """A small text PDF whose pages PyPDF2 can extract; content varies with ``seed``."""
+    topics = ["retrieval", "transformers", "caching", "latency", "embeddings", "summaries", "evaluation", "indexing"]
+    objects: List[bytes] = [b"<< /Type /Catalog /Pages 2 0 R >>", b""]
+    page_ids = []
+    for page in range(pages):
+        lines = []
+        if page == 1:
+            lines.append("2 Methods")
+        for line in range(lines_per_page):
+            topic = topics[(seed + page + line) % len(topics)]
+            lines.append(f"Paper {seed} page {page} line {line} studies {topic} for question answering.")
+        stream = "BT /F1 9 Tf 40 800 Td 11 TL " + " ".join(f"({_pdf_text(text)}) '" for text in lines) + " ET"
+        content = stream.encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 << /Type /Font /Subtype /Type1 /BaseFont /Helvetica >> >> >> "
+            b"/Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages)
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        output += b"%010d 00000 n \n" % offset
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(output)
@@ -0,0 +1,121 @@
+"""
+Earlier pipeline implementations, kept as baselines for the benchmarks
+
+Uploads no longer run any of this: pages now stream from a memory-mapped
+file through ``pdf_extraction.iter_pdf_pages`` into the token-aware chunker
+(``chunking.iter_token_chunks``).
+"""
+
+import io
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+import PyPDF2
+
+import config
+from pdf_extraction import _get_process_pool
+
+
+@dataclass
+class ExtractedDocument:
+    """Text of every page, plus where each page starts in ``full_text``."""
+
+    pages: List[str]
+    page_offsets: List[int] = field(default_factory=list)
+    full_text: str = ""
+
+    @classmethod
+    def from_pages(cls, pages: List[str]) -> "ExtractedDocument":
+        offsets = []
+        position = 0
+        for page in pages:
+            offsets.append(position)
+            position += len(page) + 1  # pages are joined with a newline
+        full_text = "\n".join(pages) + "\n" if pages else ""
+        return cls(pages=pages, page_offsets=offsets, full_text=full_text)
+
+    @property
+    def page_count(self) -> int:
+        return len(self.pages)
+
+    @property
+    def first_page_text(self) -> str:
+        return self.pages[0] if self.pages else ""
+
+    def page_at(self, offset: int) -> int:
+        """Zero-based index of the page containing ``offset`` in ``full_text``."""
+        return max(0, bisect_right(self.page_offsets, offset) - 1)
+
+
+def _extract_page_range(pdf_bytes: bytes, start: int, end: int) -> List[str]:
+    reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+    return [reader.pages[index].extract_text() or "" for index in range(start, end)]
+
+
+def _page_ranges(page_count: int, parts: int) -> List[Tuple[int, int]]:
+    size = -(-page_count // parts)
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+
+def extract_pdf(
+    pdf_bytes: bytes,
+    parallel_min_pages: Optional[int] = None,
+    workers: Optional[int] = None,
+) -> ExtractedDocument:
+    """Extract every page of a PDF held in memory, from a single parse.
+
+    Documents with at least ``parallel_min_pages`` pages are split into page
+    ranges extracted across a process pool; each worker parses the PDF once
+    for its whole range.
+    """
+    parallel_min_pages = config.PDF_PARALLEL_MIN_PAGES if parallel_min_pages is None else parallel_min_pages
+    workers = config.PDF_EXTRACT_WORKERS if workers is None else workers
+
+    reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+    page_count = len(reader.pages)
+
+    if workers > 1 and page_count >= parallel_min_pages > 0:
+        pool = _get_process_pool(workers)
+        futures = [
+            pool.submit(_extract_page_range, pdf_bytes, start, end)
+            for start, end in _page_ranges(page_count, workers)
+        ]
+        pages = [text for future in futures for text in future.result()]
+    else:
+        pages = [page.extract_text() or "" for page in reader.pages]
+
+    return ExtractedDocument.from_pages(pages)
+
+
+def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
+    """The original character chunker: overlapping windows broken at a sentence or word boundary."""
+    if len(text) <= chunk_size:
+        return [text]
+
+    chunks = []
+    start = 0
+
+    while start < len(text):
+        end = start + chunk_size
+
+        if end < len(text):
+            # Try to break at sentence boundary
+            sentence_end = text.rfind('. ', start, end)
+            if sentence_end > start:
+                end = sentence_end + 1
+            else:
+                # Break at word boundary
+                word_end = text.rfind(' ', start, end)
+                if word_end > start:
+                    end = word_end
+
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+
+        start = end - overlap
+        if start >= len(text):
+            break
+
+    return chunks
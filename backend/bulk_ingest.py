@@ -0,0 +1,305 @@
+"""
+Bulk ingestion of a directory of PDFs, outside the HTTP server
+
+Files fan out over a process pool. Each worker extracts, chunks, embeds and
+summarises one PDF with the same code as ``POST /documents/upload``. The
+parent batches the resulting records into large writes to ``collection``
+and ``summary_collection``, then records every stored document in a
+checkpoint file. Rerunning the same command skips checkpointed files and
+PDFs already in Chroma, so an interrupted run resumes where it stopped.
+
+Usage (from backend/):
+    python -m bulk_ingest /path/to/papers [--recursive] [--workers 4] [--category lab-archive]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+import config
+
+DEFAULT_CHECKPOINT = "bulk_ingest_checkpoint.jsonl"
+
+Record = Tuple[str, str, dict]
+
+
+def _limit_worker_threads(threads: int) -> None:
+    """Cap each worker's BLAS/torch threads so the pool shares the host's cores.
+
+    Spawned workers import numpy (with this module) before any initializer
+    runs, so the limits must already be in the environment they inherit.
+    """
+    os.environ.setdefault("OMP_NUM_THREADS", str(threads))
+    os.environ.setdefault("MKL_NUM_THREADS", str(threads))
+    os.environ.setdefault("OPENBLAS_NUM_THREADS", str(threads))
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+
+def prepare_document(path: str, base_id: str, category: Optional[str], source: Optional[str]) -> dict:
+    """Worker side: everything up to the Chroma writes for one PDF.
+
+    Runs in a pool process; Chroma is only touched by the parent.
+    """
+    from fastapi import HTTPException
+
+    try:
+        return _prepare_document(path, base_id, category, source)
+    except HTTPException as exc:  # does not survive pickling back to the parent
+        raise ValueError(exc.detail) from None
+
+
+def _prepare_document(path: str, base_id: str, category: Optional[str], source: Optional[str]) -> dict:
+    from routes.documents import (
+        PageStream,
+        document_metadata,
+        get_free_embeddings,
+        inspect_pdf,
+        iter_chunk_records,
+        open_pdf,
+        start_summary,
+        summary_records,
+    )
+
+    with open_pdf(path) as pdf:
+        page_count, first_page_text = inspect_pdf(pdf)
+        summary_future = start_summary(first_page_text)
+
+        base_metadata = document_metadata(
+            base_id, os.path.basename(path), os.path.getsize(path), page_count, datetime.utcnow(),
+            category=category, source=source,
+        )
+        # Documents are already spread over the bulk pool: no nested extraction pool
+        pages = PageStream(pdf, workers=1)
+        chunks = list(iter_chunk_records(base_id, pages, base_metadata))
+    if not chunks:
+        raise ValueError("No text could be extracted from the PDF")
+
+    started = time.perf_counter()
+    chunk_embeddings = np.asarray(get_free_embeddings([text for _, text, _ in chunks]), dtype=np.float32)
+    embedding_seconds = time.perf_counter() - started
+
+    summary = summary_future.result()
+    sections = summary_records(base_id, summary, base_metadata, len(chunks), pages.text_length)
+    section_embeddings = np.asarray(get_free_embeddings([text for _, text, _ in sections]), dtype=np.float32)
+
+    return {
+        "path": path,
+        "document_id": base_id,
+        "chunks": chunks,
+        "chunk_embeddings": chunk_embeddings,
+        "sections": sections,
+        "section_embeddings": section_embeddings,
+        "embedding_seconds": embedding_seconds,
+    }
+
+
+class Checkpoint:
+    """Append-only JSONL record of documents whose chunks and summary are stored."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.paths: Set[str] = set()
+        self.document_ids: Set[str] = set()
+        if os.path.exists(path):
+            with open(path) as handle:
+                for line in handle:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:  # torn last line from an interrupted run
+                        continue
+                    self.paths.add(entry["path"])
+                    self.document_ids.add(entry["document_id"])
+
+    def __contains__(self, path: str) -> bool:
+        return path in self.paths
+
+    def record(self, entries: List[dict]) -> None:
+        with open(self.path, "a") as handle:
+            for entry in entries:
+                handle.write(json.dumps(entry) + "\n")
+            handle.flush()
+            os.fsync(handle.fileno())
+        for entry in entries:
+            self.paths.add(entry["path"])
+            self.document_ids.add(entry["document_id"])
+
+
+class BatchWriter:
+    """Buffers prepared documents and writes them to Chroma in large batches.
+
+    Within a flush chunks are written before summary sections, so a document
+    only looks ingested (``find_existing_document``) once its chunks are in.
+    Writes go through ``chroma_writer`` (size-aware batches, parallel,
+    retried) as upserts by chunk id: a flush interrupted before its
+    checkpoint is simply redone on the next run.
+    """
+
+    def __init__(self, checkpoint: Checkpoint, batch_size: int):
+        self.checkpoint = checkpoint
+        self.batch_size = max(1, batch_size)
+        self.chunks: List[Record] = []
+        self.chunk_embeddings: List[np.ndarray] = []
+        self.sections: List[Record] = []
+        self.section_embeddings: List[np.ndarray] = []
+        self.completed: List[dict] = []
+        self.write_seconds = 0.0
+
+    def add(self, prepared: dict) -> None:
+        self.chunks.extend(prepared["chunks"])
+        self.chunk_embeddings.append(prepared["chunk_embeddings"])
+        self.sections.extend(prepared["sections"])
+        self.section_embeddings.append(prepared["section_embeddings"])
+        self.completed.append({
+            "path": prepared["path"],
+            "document_id": prepared["document_id"],
+            "chunks": len(prepared["chunks"]),
+            "ingested_at": time.time(),
+        })
+        if len(self.chunks) >= self.batch_size:
+            self.flush()
+
+    def _write(self, target_collection, records: List[Record], embeddings: List[np.ndarray]) -> None:
+        from chroma_writer import chroma_writer
+
+        if not records:
+            return
+        vectors = np.concatenate([block for block in embeddings if len(block)]).tolist()
+        ids, documents, metadatas = (list(column) for column in zip(*records))
+        chroma_writer.write(target_collection, ids, documents, vectors, metadatas)
+
+    def flush(self) -> None:
+        if not self.completed:
+            return
+        from registry import registry
+        from search_index import search_index
+
+        started = time.perf_counter()
+        self._write(registry.collection, self.chunks, self.chunk_embeddings)
+        search_index.add_many(self.chunks)
+        self._write(registry.summary_collection, self.sections, self.section_embeddings)
+        self.write_seconds += time.perf_counter() - started
+
+        self.checkpoint.record(self.completed)
+        self.chunks, self.chunk_embeddings = [], []
+        self.sections, self.section_embeddings = [], []
+        self.completed = []
+
+
+def iter_pdfs(directory: str, recursive: bool) -> Iterator[str]:
+    if recursive:
+        for root, dirs, files in os.walk(directory):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(".pdf"):
+                    yield os.path.abspath(os.path.join(root, name))
+    else:
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if name.lower().endswith(".pdf") and os.path.isfile(path):
+                yield os.path.abspath(path)
+
+
+def run(args: argparse.Namespace) -> Dict[str, float]:
+    from cache import file_content_hash
+    from metrics import CHROMA_WRITE_RETRIES
+    from registry import registry
+    from routes.documents import find_existing_document
+
+    checkpoint = Checkpoint(args.checkpoint)
+    writer = BatchWriter(checkpoint, args.write_batch)
+    stats = {"ingested": 0, "chunks": 0, "skipped": 0, "failed": 0}
+    seen: Set[str] = set(checkpoint.document_ids)
+    pending: Dict[Future, str] = {}
+
+    # Fail fast on a bad Chroma configuration; the workers load the embedding model
+    if not registry.check_chroma():
+        raise SystemExit(f"Cannot reach Chroma: {registry.warm_up_error}")
+    threads = max(1, (os.cpu_count() or 1) // args.workers)
+    started = time.perf_counter()
+
+    def report(line: str) -> None:
+        elapsed = time.perf_counter() - started
+        rate = stats["ingested"] / elapsed * 60 if elapsed else 0.0
+        print(f"[{elapsed:7.1f}s] {rate:6.1f} docs/min  {line}", flush=True)
+
+    def collect(done) -> None:
+        for future in done:
+            path = pending.pop(future)
+            try:
+                prepared = future.result()
+            except Exception as exc:
+                stats["failed"] += 1
+                report(f"FAILED {path}: {exc}")
+                continue
+            writer.add(prepared)
+            stats["ingested"] += 1
+            stats["chunks"] += len(prepared["chunks"])
+            report(f"{os.path.basename(path)}: {len(prepared['chunks'])} chunks")
+
+    # spawn: forking a process that already runs model threads is unsafe
+    _limit_worker_threads(threads)
+    with ProcessPoolExecutor(
+        max_workers=args.workers,
+        mp_context=multiprocessing.get_context("spawn"),
+    ) as pool:
+        for path in iter_pdfs(args.directory, args.recursive):
+            if path in checkpoint:
+                stats["skipped"] += 1
+                continue
+            base_id = file_content_hash(path)
+            if base_id in seen or find_existing_document(base_id):
+                stats["skipped"] += 1
+                continue
+            seen.add(base_id)
+
+            # Bound the prepared documents waiting in memory
+            while len(pending) >= args.workers * 2:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending[pool.submit(prepare_document, path, base_id, args.category, args.source)] = path
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+    writer.flush()
+
+    elapsed = time.perf_counter() - started
+    stats.update({
+        "seconds": round(elapsed, 1),
+        "docs_per_minute": round(stats["ingested"] / elapsed * 60, 2) if elapsed else 0.0,
+        "chunks_per_second": round(stats["chunks"] / elapsed, 1) if elapsed else 0.0,
+        "write_seconds": round(writer.write_seconds, 1),
+        "write_retries": int(sum(CHROMA_WRITE_RETRIES.values.values())),
+    })
+    return stats
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory", help="directory containing PDFs")
+    parser.add_argument("--recursive", action="store_true", help="include subdirectories")
+    parser.add_argument("--workers", type=int, default=config.PDF_EXTRACT_WORKERS, help="worker processes")
+    parser.add_argument("--write-batch", type=int, default=256, help="records buffered per flush")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="resume file")
+    parser.add_argument("--category", default=None)
+    parser.add_argument("--source", default="bulk_ingest")
+    args = parser.parse_args(argv)
+    args.workers = max(1, args.workers)
+
+    stats = run(args)
+    print(
+        f"\nIngested {stats['ingested']} documents ({stats['chunks']} chunks) in {stats['seconds']}s: "
+        f"{stats['docs_per_minute']} docs/min, {stats['chunks_per_second']} chunks/s; "
+        f"{stats['skipped']} skipped, {stats['failed']} failed, {stats['write_retries']} Chroma write retries"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,48 +1,523 @@
+import asyncio
+import hashlib
+import json
+import pickle
+import sqlite3
+import time
+from collections import OrderedDict, deque
 from threading import Lock
-from typing import Any, Dict, List, Tuple
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Sequence, Tuple
 
-from cachetools import TTLCache
+import numpy as np
+from cachetools import LRUCache, TTLCache
+
+from chunking import SENTENCE_BREAK
+from context_builder import estimate_tokens
+from metrics import record_cache
+
+# Longest line the memory summary keeps for one evicted turn
+SUMMARY_LINE_CHARS = 160
+
+
+class RedisCacheBackend:
+    """Shared key/value backend stored in Redis with server-side TTLs.
+
+    Values are pickled, so the Redis instance must be trusted by every worker.
+    """
+
+    def __init__(self, client, namespace: str, ttl_seconds: int = 600):
+        self.client = client
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def get(self, key: str) -> Any:
+        raw = self.client.get(self._key(key))
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: Any) -> None:
+        self.client.set(self._key(key), pickle.dumps(value), ex=self.ttl_seconds)
+
+
+class RedisMemoryBackend:
+    """Conversation memory stored in Redis: a list of turns plus the rolling summary.
+
+    An append is one pipelined round trip. Only when turns have to be
+    evicted into the summary does it follow with a WATCH/MULTI transaction,
+    so workers appending to the same conversation never trim it twice.
+    """
+
+    def __init__(
+        self,
+        client,
+        namespace: str,
+        ttl_seconds: int = 86_400,
+        max_messages: int = 10,
+        max_tokens: int = 500,
+        summary_max_tokens: int = 100,
+    ):
+        self.client = client
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_messages = max_messages
+        self.max_tokens = max_tokens
+        self.summary_max_tokens = summary_max_tokens
+
+    def _key(self, conversation_id: str) -> str:
+        return f"{self.namespace}:{conversation_id}"
+
+    @staticmethod
+    def _history(raw_summary: Optional[bytes], raw_turns: List[bytes]) -> List[Tuple[str, str]]:
+        history: List[Tuple[str, str]] = []
+        if raw_summary:
+            history.append(("summary", " ".join(line for line, _ in json.loads(raw_summary))))
+        history.extend((role, content) for role, content, _ in map(json.loads, raw_turns))
+        return history
+
+    def get_history(self, conversation_id: str) -> List[Tuple[str, str]]:
+        key = self._key(conversation_id)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.get(f"{key}:summary")
+        pipe.lrange(key, 0, -1)
+        raw_summary, raw_turns = pipe.execute()
+        return self._history(raw_summary, raw_turns)
+
+    def _eviction(self, raw_turns: List[bytes], raw_summary: Optional[bytes]) -> Tuple[int, list]:
+        """Turns to drop from the head of the list, and the summary they roll into."""
+        turns = [json.loads(raw) for raw in raw_turns]
+        evict = _evict_count([tokens for _, _, tokens in turns], self.max_tokens, self.max_messages)
+        if not evict:
+            return 0, []
+        summary = json.loads(raw_summary) if raw_summary else []
+        return evict, _roll_summary(summary, turns[:evict], self.summary_max_tokens)
+
+    def append_many(self, conversation_id: str, messages: Sequence[Tuple[str, str]]) -> None:
+        if not messages:  # RPUSH needs at least one value
+            return
+        key = self._key(conversation_id)
+        summary_key = f"{key}:summary"
+        pipe = self.client.pipeline(transaction=True)
+        pipe.rpush(key, *(json.dumps([role, content, estimate_tokens(content)]) for role, content in messages))
+        pipe.expire(key, self.ttl_seconds)
+        pipe.expire(summary_key, self.ttl_seconds)  # the summary lives as long as the turns
+        pipe.lrange(key, 0, -1)
+        pipe.get(summary_key)
+        *_, raw_turns, raw_summary = pipe.execute()
+
+        if not self._eviction(raw_turns, raw_summary)[0]:
+            return
+
+        def evict_into_summary(pipe) -> None:
+            # Re-read under WATCH: a concurrent append may already have trimmed
+            evict, summary = self._eviction(pipe.lrange(key, 0, -1), pipe.get(summary_key))
+            pipe.multi()
+            if evict:
+                pipe.ltrim(key, evict, -1)
+                pipe.set(summary_key, json.dumps(summary), ex=self.ttl_seconds)
+
+        self.client.transaction(evict_into_summary, key, summary_key)
+
+
+def create_redis_client(redis_url: Optional[str]):
+    """Return a Redis client for ``redis_url``, or None when Redis is not configured."""
+    if not redis_url:
+        return None
+    import redis
+
+    return redis.Redis.from_url(redis_url)
 
 
 class SimpleTTLCache:
-    """Thread-safe TTL cache used for responses and summaries."""
+    """Thread-safe TTL cache used for responses and summaries.
+
+    With a shared ``backend`` (e.g. ``RedisCacheBackend``) the local TTLCache
+    acts as a near cache in front of it, using ``near_ttl_seconds``.
+    """
 
-    def __init__(self, max_size: int = 256, ttl_seconds: int = 600):
-        self.cache = TTLCache(maxsize=max_size, ttl=ttl_seconds)
+    def __init__(
+        self,
+        max_size: int = 256,
+        ttl_seconds: int = 600,
+        backend: Optional[RedisCacheBackend] = None,
+        near_ttl_seconds: Optional[int] = None,
+        name: str = "cache",
+    ):
+        self.name = name
+        local_ttl = min(ttl_seconds, near_ttl_seconds) if backend and near_ttl_seconds else ttl_seconds
+        self.cache = TTLCache(maxsize=max_size, ttl=local_ttl)
         self.lock = Lock()
+        self.backend = backend
 
     def get(self, key: str) -> Any:
         with self.lock:
-            return self.cache.get(key)
+            value = self.cache.get(key)
+        if value is None and self.backend is not None:
+            value = self.backend.get(key)
+            if value is not None:
+                with self.lock:
+                    self.cache[key] = value
+        record_cache(self.name, value is not None)
+        return value
 
     def set(self, key: str, value: Any) -> None:
         with self.lock:
             self.cache[key] = value
+        if self.backend is not None:
+            self.backend.set(key, value)
+
+
+_FAILED = object()
+
+
+class SingleFlight:
+    """Coalesce concurrent identical async computations in one process.
+
+    The first caller for a key runs ``compute``; callers arriving while it is
+    in flight await the same result, or the same exception if it fails. A
+    waiter computes on its own if the leader is cancelled or takes longer
+    than ``timeout_seconds``.
+    """
+
+    def __init__(self, timeout_seconds: float = 30, name: str = "inflight"):
+        self.timeout_seconds = timeout_seconds
+        self.name = name
+        self.pending: Dict[str, asyncio.Future] = {}
+
+    async def run(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        leader = self.pending.get(key)
+        record_cache(self.name, leader is not None)
+        if leader is not None:
+            try:
+                result = await asyncio.wait_for(asyncio.shield(leader), self.timeout_seconds)
+            except asyncio.TimeoutError:
+                result = _FAILED
+            return await compute() if result is _FAILED else result
+
+        future = asyncio.get_running_loop().create_future()
+        self.pending[key] = future
+        try:
+            result = await compute()
+        except asyncio.CancelledError:
+            future.set_result(_FAILED)  # the leader's client went away, not the computation
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            future.exception()  # there may be no waiters to retrieve it
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if self.pending.get(key) is future:
+                del self.pending[key]
+
+
+class _Conversation:
+    """Turns in the window, their token total and the summary of evicted turns."""
+
+    __slots__ = ("turns", "tokens", "summary")
+
+    def __init__(self):
+        self.turns: Deque[Tuple[str, str, int]] = deque()
+        self.tokens = 0
+        self.summary: List[Tuple[str, int]] = []
+
+
+def _evict_count(turn_tokens: Sequence[int], max_tokens: int, max_messages: int) -> int:
+    """How many of the oldest turns to drop so the rest fit; the newest turn always stays."""
+    total = sum(turn_tokens)
+    evict = 0
+    while evict < len(turn_tokens) - 1 and (total > max_tokens or len(turn_tokens) - evict > max_messages):
+        total -= turn_tokens[evict]
+        evict += 1
+    return evict
+
+
+def _summarize_turn(role: str, content: str) -> str:
+    """Extractive one-liner for an evicted turn: its first sentence, clipped."""
+    first = SENTENCE_BREAK.split(content.strip(), 1)[0]
+    if len(first) > SUMMARY_LINE_CHARS:
+        first = first[: SUMMARY_LINE_CHARS - 3].rstrip() + "..."
+    return f"{role.capitalize()}: {first}"
+
+
+def _roll_summary(summary: List[Tuple[str, int]], evicted: Sequence[Sequence], max_tokens: int) -> List[Tuple[str, int]]:
+    """Append evicted turns to the summary, dropping its oldest lines past ``max_tokens``."""
+    summary = list(summary)
+    for role, content, _ in evicted:
+        line = _summarize_turn(role, content)
+        summary.append((line, estimate_tokens(line)))
+    total = sum(tokens for _, tokens in summary)
+    while summary and total > max_tokens:
+        total -= summary.pop(0)[1]
+    return summary
 
 
 class MemoryStore:
-    """Conversation memory with TTL and message cap per conversation."""
+    """Conversation memory with TTL and a token budget per conversation.
+
+    Turns are appended in place. Once the window holds more than
+    ``max_tokens`` (or ``max_messages`` turns), the oldest turns are evicted
+    into a rolling extractive summary of at most ``summary_max_tokens``, so
+    the memory kept and sent to the prompt stays bounded however long the
+    conversation runs. ``get_history`` returns the summary first, as a
+    ``("summary", text)`` entry, followed by the turns in the window.
+
+    Pass a ``RedisMemoryBackend`` to share conversations across workers;
+    memory is read from the backend on every call so a conversation stays
+    consistent whichever worker serves the next turn.
+    """
 
-    def __init__(self, max_conversations: int = 256, ttl_seconds: int = 86_400, max_messages: int = 10):
+    def __init__(
+        self,
+        max_conversations: int = 256,
+        ttl_seconds: int = 86_400,
+        max_messages: int = 10,
+        max_tokens: int = 500,
+        summary_max_tokens: int = 100,
+        backend: Optional[RedisMemoryBackend] = None,
+    ):
         self.cache = TTLCache(maxsize=max_conversations, ttl=ttl_seconds)
         self.lock = Lock()
         self.max_messages = max_messages
+        self.max_tokens = max_tokens
+        self.summary_max_tokens = summary_max_tokens
+        self.backend = backend
 
     def get_history(self, conversation_id: str) -> List[Tuple[str, str]]:
+        if self.backend is not None:
+            history = self.backend.get_history(conversation_id)
+        else:
+            history = []
+            with self.lock:
+                conversation: Optional[_Conversation] = self.cache.get(conversation_id)
+                if conversation is not None:
+                    if conversation.summary:
+                        history.append(("summary", " ".join(line for line, _ in conversation.summary)))
+                    history.extend((role, content) for role, content, _ in conversation.turns)
+        record_cache("memory", bool(history))
+        return history
+
+    def append_many(self, conversation_id: str, messages: Sequence[Tuple[str, str]]) -> None:
+        """Append several turns at once, e.g. a question and its answer."""
+        if not messages:
+            return
+        if self.backend is not None:
+            self.backend.append_many(conversation_id, messages)
+            return
+        with self.lock:
+            conversation: Optional[_Conversation] = self.cache.get(conversation_id)
+            if conversation is None:
+                conversation = _Conversation()
+            for role, content in messages:
+                tokens = estimate_tokens(content)
+                conversation.turns.append((role, content, tokens))
+                conversation.tokens += tokens
+
+            evicted = []
+            while len(conversation.turns) > 1 and (
+                conversation.tokens > self.max_tokens or len(conversation.turns) > self.max_messages
+            ):
+                turn = conversation.turns.popleft()
+                conversation.tokens -= turn[2]
+                evicted.append(turn)
+            if evicted:
+                conversation.summary = _roll_summary(conversation.summary, evicted, self.summary_max_tokens)
+            # Re-insert to refresh the TTL; the conversation object itself is not copied
+            self.cache[conversation_id] = conversation
+
+    def append(self, conversation_id: str, role: str, content: str) -> None:
+        self.append_many(conversation_id, [(role, content)])
+
+
+class SemanticCache:
+    """Per-document response cache matched by question embedding similarity.
+
+    Entries are kept per document in LRU order and expire after the TTL. A
+    lookup returns the stored value whose question embedding has the highest
+    cosine similarity to the query, provided it reaches the threshold.
+    """
+
+    def __init__(
+        self,
+        similarity_threshold: float = 0.92,
+        max_entries_per_document: int = 128,
+        max_documents: int = 256,
+        ttl_seconds: int = 600,
+    ):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries_per_document = max_entries_per_document
+        self.ttl_seconds = ttl_seconds
+        self.documents: LRUCache = LRUCache(maxsize=max_documents)
+        self.lock = Lock()
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.hit_similarity_total = 0.0
+        self.miss_similarity_total = 0.0
+        self.miss_similarity_count = 0
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(self, document_id: str, embedding: Sequence[float]) -> Tuple[Any, Optional[float]]:
+        """Return ``(value, similarity)`` for the closest entry, or ``(None, best_similarity)``."""
+        query = self._normalize(embedding)
+        now = time.monotonic()
+        with self.lock:
+            entries: Optional[OrderedDict] = self.documents.get(document_id)
+            if entries:
+                for entry_id in [key for key, (expires_at, _, _) in entries.items() if expires_at <= now]:
+                    del entries[entry_id]
+
+            if not entries:
+                self.misses += 1
+                return None, None
+
+            entry_ids = list(entries.keys())
+            matrix = np.stack([entries[entry_id][1] for entry_id in entry_ids])
+            similarities = matrix @ query
+            best = int(np.argmax(similarities))
+            best_similarity = float(similarities[best])
+
+            if best_similarity < self.similarity_threshold:
+                self.misses += 1
+                self.miss_similarity_total += best_similarity
+                self.miss_similarity_count += 1
+                return None, best_similarity
+
+            entries.move_to_end(entry_ids[best])
+            self.hits += 1
+            self.hit_similarity_total += best_similarity
+            return entries[entry_ids[best]][2], best_similarity
+
+    def set(self, document_id: str, embedding: Sequence[float], value: Any) -> None:
+        vector = self._normalize(embedding)
+        with self.lock:
+            entries: Optional[OrderedDict] = self.documents.get(document_id)
+            if entries is None:
+                entries = OrderedDict()
+                self.documents[document_id] = entries
+            self._next_id += 1
+            entries[self._next_id] = (time.monotonic() + self.ttl_seconds, vector, value)
+            while len(entries) > self.max_entries_per_document:
+                entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "similarity_threshold": self.similarity_threshold,
+                "avg_hit_similarity": self.hit_similarity_total / self.hits if self.hits else None,
+                "avg_miss_similarity": (
+                    self.miss_similarity_total / self.miss_similarity_count if self.miss_similarity_count else None
+                ),
+                "documents": len(self.documents),
+                "entries": sum(len(entries) for entries in self.documents.values()),
+            }
+
+
+class EmbeddingDiskCache:
+    """On-disk embedding cache keyed by model name and a hash of the text.
+
+    Backed by SQLite so it survives restarts and is shared by every worker
+    on the host. Vectors are stored as float32 blobs. Each row records when
+    it was last read or written; inserts past ``max_rows`` evict the least
+    recently used rows (0 keeps every row).
+    """
+
+    def __init__(self, path: str, max_rows: int = 0):
+        self.path = path
+        self.max_rows = max_rows
+        self.lock = Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings "
+            "(key TEXT PRIMARY KEY, vector BLOB NOT NULL, accessed_at REAL NOT NULL DEFAULT 0)"
+        )
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(embeddings)")}
+        if "accessed_at" not in columns:  # cache files written before eviction existed
+            self.conn.execute("ALTER TABLE embeddings ADD COLUMN accessed_at REAL NOT NULL DEFAULT 0")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS embeddings_accessed_at ON embeddings (accessed_at)")
+        self.conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model_name: str, text: str) -> str:
+        return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, model_name: str, texts: List[str]) -> List[Optional[List[float]]]:
+        keys = [self.make_key(model_name, text) for text in texts]
+        found: Dict[str, bytes] = {}
         with self.lock:
-            return list(self.cache.get(conversation_id, []))
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start : start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self.conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update(rows)
+                if rows and self.max_rows:
+                    hit_keys = [key for key, _ in rows]
+                    self.conn.execute(
+                        f"UPDATE embeddings SET accessed_at = ? WHERE key IN ({','.join('?' * len(hit_keys))})",
+                        [time.time(), *hit_keys],
+                    )
+            if found and self.max_rows:
+                self.conn.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
 
-    def append(self, conversation_id: str, role: str, content: str) -> List[Tuple[str, str]]:
+        return [
+            np.frombuffer(found[key], dtype=np.float32).tolist() if key in found else None
+            for key in keys
+        ]
+
+    def set_many(self, model_name: str, texts: List[str], vectors: List[List[float]]) -> None:
+        now = time.time()
+        rows = [
+            (self.make_key(model_name, text), np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
         with self.lock:
-            history = list(self.cache.get(conversation_id, []))
-            history.append((role, content))
-            if len(history) > self.max_messages:
-                history = history[-self.max_messages :]
-            self.cache[conversation_id] = history
-            return history
+            self.conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector, accessed_at) VALUES (?, ?, ?)", rows)
+            if self.max_rows:
+                (count,) = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+                if count > self.max_rows:
+                    self.conn.execute(
+                        "DELETE FROM embeddings WHERE key IN "
+                        "(SELECT key FROM embeddings ORDER BY accessed_at, rowid LIMIT ?)",
+                        (count - self.max_rows,),
+                    )
+            self.conn.commit()
 
 
 def make_cache_key(*parts: str) -> str:
     """Build a stable cache key from string fragments."""
     normalized = [part.strip().lower() for part in parts if part]
     return "::".join(normalized)
+
+
+def content_hash(data: bytes) -> str:
+    """Stable identifier for a blob of content (e.g. uploaded PDF bytes)."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_content_hash(path: str, block_size: int = 1 << 20) -> str:
+    """``content_hash`` of a file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
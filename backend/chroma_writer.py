@@ -0,0 +1,186 @@
+"""
+Batched, parallel and retrying writes to Chroma collections
+"""
+
+import json
+import logging
+import random
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock
+from typing import List, Optional, Sequence
+
+import config
+from metrics import (
+    CHROMA_WRITE_BATCHES,
+    CHROMA_WRITE_RECORDS,
+    CHROMA_WRITE_RETRIES,
+    CHROMA_WRITE_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Embeddings travel as JSON numbers: roughly this many bytes per dimension
+BYTES_PER_DIMENSION = 12
+
+
+class ChromaWriteError(Exception):
+    """A batch still failed after every retry."""
+
+
+def _collection_name(collection) -> str:
+    return getattr(collection, "name", None) or "unknown"
+
+
+def record_size(record_id: str, document: str, embedding: Sequence[float], metadata: Optional[dict]) -> int:
+    """Estimated request payload of one record, in bytes."""
+    return (
+        len(record_id)
+        + len(document.encode("utf-8"))
+        + len(embedding) * BYTES_PER_DIMENSION
+        + (len(json.dumps(metadata, default=str)) if metadata else 0)
+    )
+
+
+def split_batches(sizes: Sequence[int], max_records: int, max_bytes: int) -> List[range]:
+    """Split records into consecutive runs within both limits.
+
+    A record larger than ``max_bytes`` on its own still gets a batch of one.
+    """
+    batches: List[range] = []
+    start = 0
+    batch_bytes = 0
+    for index, size in enumerate(sizes):
+        if index > start and (index - start >= max_records or batch_bytes + size > max_bytes):
+            batches.append(range(start, index))
+            start, batch_bytes = index, 0
+        batch_bytes += size
+    if start < len(sizes):
+        batches.append(range(start, len(sizes)))
+    return batches
+
+
+class ChromaWriter:
+    """Upserts records into Chroma collections in size-aware batches.
+
+    Records are split into batches of at most ``max_batch_records`` records
+    and an estimated ``max_batch_bytes`` of payload. Batches are sent on a
+    shared pool of ``concurrency`` threads, so all uploads together never
+    have more writes in flight than that. A failed batch is retried up to
+    ``retries`` times with exponential backoff and jitter. Writes are upserts
+    keyed by record id, so a retried or repeated batch is harmless.
+    """
+
+    def __init__(
+        self,
+        max_batch_records: int = 100,
+        max_batch_bytes: int = 4_000_000,
+        concurrency: int = 4,
+        retries: int = 4,
+        backoff_seconds: float = 0.5,
+    ):
+        self.max_batch_records = max(1, max_batch_records)
+        self.max_batch_bytes = max(1, max_batch_bytes)
+        self.concurrency = max(1, concurrency)
+        self.retries = max(0, retries)
+        self.backoff_seconds = backoff_seconds
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = Lock()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="chroma-write")
+        return self._executor
+
+    def _write_batch(self, collection, ids, documents, embeddings, metadatas) -> int:
+        name = _collection_name(collection)
+        started = time.perf_counter()
+        for attempt in range(self.retries + 1):
+            try:
+                collection.upsert(ids=ids, documents=documents, embeddings=embeddings, metadatas=metadatas)
+                break
+            except (TypeError, ValueError):  # malformed records: retrying cannot help
+                CHROMA_WRITE_BATCHES.inc(collection=name, result="failed")
+                raise
+            except Exception as exc:
+                if attempt == self.retries:
+                    CHROMA_WRITE_BATCHES.inc(collection=name, result="failed")
+                    raise ChromaWriteError(
+                        f"Writing {len(ids)} records to {name} failed after {attempt + 1} attempts: {exc}"
+                    ) from exc
+                CHROMA_WRITE_RETRIES.inc(collection=name)
+                delay = self.backoff_seconds * 2 ** attempt * random.uniform(0.5, 1.0)
+                logger.warning("Chroma write to %s failed (%s); retrying in %.2fs", name, exc, delay)
+                time.sleep(delay)
+
+        CHROMA_WRITE_SECONDS.observe(time.perf_counter() - started, collection=name)
+        CHROMA_WRITE_BATCHES.inc(collection=name, result="ok")
+        CHROMA_WRITE_RECORDS.inc(len(ids), collection=name)
+        return len(ids)
+
+    def submit(
+        self,
+        collection,
+        ids: List[str],
+        documents: List[str],
+        embeddings: Sequence[Sequence[float]],
+        metadatas: List[dict],
+    ) -> Future:
+        """Queue the records; the future resolves with the count once every batch is written.
+
+        If any batch fails for good, the future carries that error; the
+        other batches are still written.
+        """
+        sizes = [
+            record_size(record_id, document, embedding, metadata)
+            for record_id, document, embedding, metadata in zip(ids, documents, embeddings, metadatas)
+        ]
+        batches = split_batches(sizes, self.max_batch_records, self.max_batch_bytes)
+        result: Future = Future()
+        if not batches:
+            result.set_result(0)
+            return result
+
+        lock = Lock()
+        remaining = [len(batches)]
+        errors: List[BaseException] = []
+
+        def done(batch_future: Future) -> None:
+            error = batch_future.exception()
+            with lock:
+                if error is not None:
+                    errors.append(error)
+                remaining[0] -= 1
+                finished = remaining[0] == 0
+            if finished:
+                if errors:
+                    result.set_exception(errors[0])
+                else:
+                    result.set_result(len(ids))
+
+        for batch in batches:
+            self.executor.submit(
+                self._write_batch,
+                collection,
+                ids[batch.start : batch.stop],
+                documents[batch.start : batch.stop],
+                embeddings[batch.start : batch.stop],
+                metadatas[batch.start : batch.stop],
+            ).add_done_callback(done)
+        return result
+
+    def write(self, collection, ids, documents, embeddings, metadatas) -> int:
+        """Write the records and wait; raises ChromaWriteError if a batch keeps failing."""
+        return self.submit(collection, ids, documents, embeddings, metadatas).result()
+
+
+chroma_writer = ChromaWriter(
+    max_batch_records=config.CHROMA_WRITE_BATCH_SIZE,
+    max_batch_bytes=config.CHROMA_WRITE_MAX_BYTES,
+    concurrency=config.CHROMA_WRITE_CONCURRENCY,
+    retries=config.CHROMA_WRITE_RETRIES,
+    backoff_seconds=config.CHROMA_WRITE_BACKOFF_SECONDS,
+)
@@ -0,0 +1,139 @@
+"""
+Token-aware chunking that respects page and section boundaries
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+# "3 Methods", "2.1. Data Collection", "IV. RESULTS", "Abstract", "Related Work", "REFERENCES"
+SECTION_HEADING = re.compile(
+    r"^(?:(?:\d+(?:\.\d+)*\.?|[IVXLC]+\.)\s+[A-Z][^.!?]{0,60}"
+    r"|(?:Abstract|Introduction|Related Work|Background|Methods?|Methodology|Results|Discussion"
+    r"|Conclusions?|References|Acknowledge?ments?|Appendix)(?:\s+(?:and|of|&|[A-Z][\w-]*))*:?"
+    r"|[A-Z][A-Z0-9 ,:&-]{3,60})$"
+)
+# Lines ending like this carry on to the next line, so they are body text
+WRAPPED_ENDING = re.compile(
+    r"(?:[,;(-]|\b(?:a|an|and|as|at|by|for|from|in|into|of|on|or|than|that|the|to|via|with))$",
+    re.IGNORECASE,
+)
+HEADING_MAX_WORDS = 8
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+")
+
+
+@dataclass
+class Chunk:
+    text: str
+    page_number: int  # 1-based
+    section: str
+    token_count: int
+
+
+def _is_heading(line: str, next_line: str) -> bool:
+    """A short line matching a heading pattern, not a wrapped line of body text.
+
+    Body lines that happen to start with a number or a capital ("12 Baselines
+    drawn from prior work and evaluated on") are told apart by their length,
+    a trailing connective, or a lowercase continuation on the next line.
+    """
+    return (
+        len(line) <= 80
+        and len(line.split()) <= HEADING_MAX_WORDS
+        and SECTION_HEADING.match(line) is not None
+        and WRAPPED_ENDING.search(line) is None
+        and not next_line[:1].islower()
+    )
+
+
+def _segments(page_text: str) -> Iterator[Tuple[Optional[str], str]]:
+    """Split a page into (heading, body) runs; heading is None until one is seen."""
+    lines = [line.strip() for line in page_text.splitlines()]
+    heading: Optional[str] = None
+    body: List[str] = []
+    for index, line in enumerate(lines):
+        if not line:
+            continue
+        next_line = next((following for following in lines[index + 1 :] if following), "")
+        if _is_heading(line, next_line):
+            if body:
+                yield heading, " ".join(body)
+                body = []
+            heading = line
+        else:
+            body.append(line)
+    if body or heading:
+        yield heading, " ".join(body)
+
+
+def _split_long_sentence(tokenizer, sentence: str, max_tokens: int) -> List[Tuple[str, int]]:
+    """Cut a sentence longer than the budget at token offsets."""
+    encoding = tokenizer(sentence, add_special_tokens=False, return_offsets_mapping=True)
+    offsets = encoding["offset_mapping"]
+    pieces = []
+    for start in range(0, len(offsets), max_tokens):
+        window = offsets[start : start + max_tokens]
+        text = sentence[window[0][0] : window[-1][1]].strip()
+        if text:
+            pieces.append((text, len(window)))
+    return pieces
+
+
+def iter_token_chunks(
+    pages: Iterable[str],
+    tokenizer,
+    max_tokens: int = 256,
+    overlap_tokens: int = 32,
+) -> Iterator[Chunk]:
+    """Lazily yield chunks of at most ``max_tokens`` tokens.
+
+    Tokens are counted with the embedding model's own tokenizer, so no chunk
+    is silently truncated at encode time. Chunks break at sentence ends,
+    never span two pages, and start afresh at each detected section heading,
+    whose text opens the section's first chunk.
+    Consecutive chunks within a section share up to ``overlap_tokens`` tokens
+    of trailing sentences.
+    """
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+    section = ""
+    pending_heading: Optional[str] = None  # seen, but not yet followed by any body
+
+    for page_index, page_text in enumerate(pages):
+        for heading, body in _segments(page_text):
+            if heading and heading != section:
+                section = pending_heading = heading
+            sentences = [sentence for sentence in SENTENCE_BREAK.split(body) if sentence.strip()]
+            if not sentences:
+                continue
+            if pending_heading:
+                # The heading text stays searchable as the first unit of its section
+                sentences.insert(0, pending_heading)
+                pending_heading = None
+
+            token_counts = [len(ids) for ids in tokenizer(sentences, add_special_tokens=False)["input_ids"]]
+            units: List[Tuple[str, int]] = []
+            for sentence, count in zip(sentences, token_counts):
+                if count > max_tokens:
+                    units.extend(_split_long_sentence(tokenizer, sentence, max_tokens))
+                else:
+                    units.append((sentence, count))
+
+            current: List[Tuple[str, int]] = []
+            current_tokens = 0
+            for unit in units:
+                if current and current_tokens + unit[1] > max_tokens:
+                    yield Chunk(" ".join(text for text, _ in current), page_index + 1, section, current_tokens)
+                    # Carry trailing sentences forward as overlap
+                    carried: List[Tuple[str, int]] = []
+                    carried_tokens = 0
+                    for previous in reversed(current):
+                        if carried_tokens + previous[1] > overlap_tokens or carried_tokens + previous[1] + unit[1] > max_tokens:
+                            break
+                        carried.insert(0, previous)
+                        carried_tokens += previous[1]
+                    current, current_tokens = carried, carried_tokens
+                current.append(unit)
+                current_tokens += unit[1]
+
+            if current:
+                yield Chunk(" ".join(text for text, _ in current), page_index + 1, section, current_tokens)
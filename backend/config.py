@@ -10,11 +10,73 @@ CHROMA_DATABSE = os.getenv("CHROMA_DATABSE")
 CHROMA_API_KEY = os.getenv("CHROMA_API_KEY")
 CHROMA_COLLECTION = os.getenv("CHROMA_COLLECTION", "documents_collection")
 SUMMARIES_COLLECTION = os.getenv("SUMMARIES_COLLECTION", "summaries_collection")
+# Chroma writes: batch limits, threads shared by all uploads, retries with backoff
+CHROMA_WRITE_BATCH_SIZE = int(os.getenv("CHROMA_WRITE_BATCH_SIZE", "100"))
+CHROMA_WRITE_MAX_BYTES = int(os.getenv("CHROMA_WRITE_MAX_BYTES", "4000000"))
+CHROMA_WRITE_CONCURRENCY = int(os.getenv("CHROMA_WRITE_CONCURRENCY", "4"))
+CHROMA_WRITE_RETRIES = int(os.getenv("CHROMA_WRITE_RETRIES", "4"))
+CHROMA_WRITE_BACKOFF_SECONDS = float(os.getenv("CHROMA_WRITE_BACKOFF_SECONDS", "0.5"))
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# Per-request cProfile, triggered by an "X-Profile: 1" header when enabled
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
 
 # Caching and memory configuration
 CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", "600"))
 MEMORY_TTL_SECONDS = int(os.getenv("MEMORY_TTL_SECONDS", "86400"))
 MEMORY_MAX_MESSAGES = int(os.getenv("MEMORY_MAX_MESSAGES", "10"))
+# Turns kept verbatim per conversation; older turns roll into a short summary
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "500"))
+MEMORY_SUMMARY_MAX_TOKENS = int(os.getenv("MEMORY_SUMMARY_MAX_TOKENS", "100"))
+
+# Semantic (embedding similarity) response cache
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "128"))
+SEMANTIC_CACHE_TTL_SECONDS = int(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", str(CACHE_TTL_SECONDS)))
+SINGLE_FLIGHT_TIMEOUT_SECONDS = float(os.getenv("SINGLE_FLIGHT_TIMEOUT_SECONDS", "30"))
+SUMMARY_CACHE_TTL_SECONDS = int(os.getenv("SUMMARY_CACHE_TTL_SECONDS", "86400"))
+
+# Ingestion / embedding configuration
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "256"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")  # torch | onnx
+EMBEDDING_ONNX_QUANTIZED = os.getenv("EMBEDDING_ONNX_QUANTIZED", "false").lower() in ("1", "true", "yes")
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE") or None
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.db")  # empty disables
+# Least recently used vectors are evicted past this many rows (~3 KB each for a 768-d model); 0 = unbounded
+EMBEDDING_CACHE_MAX_ROWS = int(os.getenv("EMBEDDING_CACHE_MAX_ROWS", "200000"))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "64"))
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Uploads are spooled to disk and read this many pages at a time
+PDF_STREAM_WINDOW_PAGES = int(os.getenv("PDF_STREAM_WINDOW_PAGES", "16"))
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR") or None  # default: system temp dir
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "16"))
+INGEST_JOB_TTL_SECONDS = int(os.getenv("INGEST_JOB_TTL_SECONDS", "3600"))
+
+# Local per-document vector index for retrieval
+LOCAL_INDEX_MAX_MB = int(os.getenv("LOCAL_INDEX_MAX_MB", "256"))
+
+# Context assembly (dedup, MMR and token budget for context + memory)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
+CONTEXT_MEMORY_SHARE = float(os.getenv("CONTEXT_MEMORY_SHARE", "0.3"))
+CONTEXT_CANDIDATE_MULTIPLIER = int(os.getenv("CONTEXT_CANDIDATE_MULTIPLIER", "3"))
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.95"))
+CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))
+
+# Hybrid corpus search (/query): BM25 log + vector search fused by reciprocal rank
+SEARCH_INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", "search_index.jsonl")  # empty keeps it in memory only
+SEARCH_CANDIDATE_DEPTH = int(os.getenv("SEARCH_CANDIDATE_DEPTH", "100"))
+SEARCH_LEXICAL_WEIGHT = float(os.getenv("SEARCH_LEXICAL_WEIGHT", "0.5"))
+SEARCH_RRF_K = int(os.getenv("SEARCH_RRF_K", "60"))
+
+# Batch QA (/qa/ask/batch)
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "50"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
 
 # Optional external cache (Redis) support
-REDIS_URL = os.getenv("REDIS_URL")
\ No newline at end of file
+REDIS_URL = os.getenv("REDIS_URL")
+REDIS_KEY_PREFIX = os.getenv("REDIS_KEY_PREFIX", "rag")
+CACHE_NEAR_TTL_SECONDS = int(os.getenv("CACHE_NEAR_TTL_SECONDS", "30"))
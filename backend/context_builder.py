@@ -0,0 +1,177 @@
+"""
+Context assembly: de-overlap, de-duplicate, MMR re-rank and fit a token budget
+"""
+
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from chunking import SENTENCE_BREAK
+
+
+@dataclass
+class Passage:
+    text: str
+    distance: float
+    embedding: np.ndarray
+    source: str  # "chunk" or "summary"
+    metadata: dict = field(default_factory=dict)
+
+
+@dataclass
+class AssembledContext:
+    passages: List[Passage]
+    history: List[Tuple[str, str]]
+    tokens_before: int
+    tokens_after: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+    @property
+    def texts(self) -> List[str]:
+        return [passage.text for passage in self.passages]
+
+    @property
+    def distances(self) -> List[float]:
+        return [passage.distance for passage in self.passages]
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap LLM token estimate (~4 characters per token for English prose)."""
+    return (len(text) + 3) // 4
+
+
+def _history_tokens(history: Sequence[Tuple[str, str]]) -> int:
+    return sum(estimate_tokens(content) + 2 for _, content in history)
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def trim_adjacent_overlap(passages: List[Passage]) -> None:
+    """Drop the trailing sentences a chunk repeats from the chunk just before it (in place)."""
+    by_chunk_id = {
+        passage.metadata["chunk_id"]: passage
+        for passage in passages
+        if passage.source == "chunk" and "chunk_id" in passage.metadata
+    }
+    for chunk_id, passage in by_chunk_id.items():
+        previous = by_chunk_id.get(chunk_id - 1)
+        if previous is None:
+            continue
+        # The chunker carries whole sentences, so overlaps start at a sentence break
+        for match in SENTENCE_BREAK.finditer(previous.text):
+            overlap = previous.text[match.end():]
+            if overlap and passage.text.startswith(overlap):
+                passage.text = passage.text[len(overlap):].lstrip()
+                break
+
+
+def drop_near_duplicates(passages: List[Passage], threshold: float) -> List[Passage]:
+    """Keep the closest passage of every group whose embeddings exceed ``threshold`` cosine."""
+    ranked = sorted(passages, key=lambda passage: passage.distance)
+    kept: List[Passage] = []
+    kept_vectors: List[np.ndarray] = []
+    for passage in ranked:
+        vector = _normalize(passage.embedding)
+        if kept_vectors and float(np.max(np.stack(kept_vectors) @ vector)) >= threshold:
+            continue
+        kept.append(passage)
+        kept_vectors.append(vector)
+    return kept
+
+
+def mmr_rerank(passages: List[Passage], query_embedding: Sequence[float], k: int, mmr_lambda: float) -> List[Passage]:
+    """Maximal marginal relevance: trade relevance to the query against redundancy."""
+    if not passages:
+        return []
+    vectors = _normalize(np.stack([passage.embedding for passage in passages]))
+    query = _normalize(np.asarray(query_embedding, dtype=np.float32))
+    relevance = vectors @ query
+    similarity = vectors @ vectors.T
+
+    selected: List[int] = []
+    remaining = list(range(len(passages)))
+    while remaining and len(selected) < k:
+        if selected:
+            redundancy = similarity[np.ix_(remaining, selected)].max(axis=1)
+        else:
+            redundancy = np.zeros(len(remaining))
+        scores = mmr_lambda * relevance[remaining] - (1 - mmr_lambda) * redundancy
+        best = remaining[int(np.argmax(scores))]
+        selected.append(best)
+        remaining.remove(best)
+    return [passages[index] for index in selected]
+
+
+def fit_history(history: Sequence[Tuple[str, str]], budget: int) -> List[Tuple[str, str]]:
+    """Keep the most recent turns that fit in ``budget`` tokens."""
+    kept: List[Tuple[str, str]] = []
+    used = 0
+    for role, content in reversed(history):
+        cost = estimate_tokens(content) + 2
+        if used + cost > budget:
+            break
+        kept.append((role, content))
+        used += cost
+    kept.reverse()
+    return kept
+
+
+def assemble_context(
+    query_embedding: Sequence[float],
+    passages: List[Passage],
+    history: Sequence[Tuple[str, str]],
+    baseline: List[Passage],
+    max_passages: int,
+    token_budget: int,
+    memory_share: float = 0.3,
+    mmr_lambda: float = 0.7,
+    dedup_threshold: float = 0.95,
+) -> AssembledContext:
+    """Select the passages and memory turns that go into the prompt.
+
+    ``baseline`` is what would have been sent verbatim without this stage;
+    it is only used to report how many tokens were saved.
+    """
+    tokens_before = sum(estimate_tokens(passage.text) for passage in baseline) + _history_tokens(history)
+
+    candidates = drop_near_duplicates(passages, dedup_threshold)
+    ranked = mmr_rerank(candidates, query_embedding, max_passages, mmr_lambda)
+    trim_adjacent_overlap(ranked)
+
+    kept_history = fit_history(history, int(token_budget * memory_share))
+    remaining = token_budget - _history_tokens(kept_history)
+
+    selected: List[Passage] = []
+    for passage in ranked:
+        cost = estimate_tokens(passage.text)
+        if not passage.text or cost > remaining:
+            continue
+        selected.append(passage)
+        remaining -= cost
+
+    tokens_after = sum(estimate_tokens(passage.text) for passage in selected) + _history_tokens(kept_history)
+    return AssembledContext(
+        passages=selected,
+        history=kept_history,
+        tokens_before=tokens_before,
+        tokens_after=tokens_after,
+    )
+
+
+def passages_from_results(results: dict, source: str) -> List[Passage]:
+    """Build passages from a ``LocalVectorIndex.query(..., include_embeddings=True)`` result."""
+    documents = results.get("documents", [[]])[0]
+    distances = results.get("distances", [[]])[0]
+    metadatas = results.get("metadatas", [[]])[0] or [{} for _ in documents]
+    embeddings: Optional[list] = results.get("embeddings", [[]])[0]
+    return [
+        Passage(text=text, distance=distance, embedding=np.asarray(embedding, dtype=np.float32), source=source, metadata=metadata or {})
+        for text, distance, metadata, embedding in zip(documents, distances, metadatas, embeddings)
+    ]
@@ -4,6 +4,7 @@ import config
 
 
 def get_chroma_client():
+    """Create a Chroma Cloud client. Use ``registry.chroma_client`` for the shared instance."""
     client = chromadb.CloudClient(
         tenant=config.CHROMA_TENENT,
         database=config.CHROMA_DATABSE,
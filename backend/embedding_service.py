@@ -0,0 +1,205 @@
+"""
+Process-wide SentenceTransformer embedding service shared by all routers
+"""
+
+import asyncio
+import time
+from concurrent.futures import Future
+from queue import Empty, Queue
+from threading import Lock, Thread
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+import config
+from cache import EmbeddingDiskCache
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-mpnet-base-v2"
+
+# ONNX exports published alongside the model on the Hugging Face Hub
+ONNX_FILE_NAME = "onnx/model.onnx"
+ONNX_QUANTIZED_FILE_NAME = "onnx/model_quint8_avx2.onnx"
+
+
+class EmbeddingService:
+    """One embedding model per process with micro-batching for query encodes.
+
+    Single-text encodes from concurrent requests are queued and collected by
+    a worker thread. When several callers are waiting, the worker holds the
+    batch open for up to ``batch_window_ms`` so they share one encode call;
+    a lone caller is dispatched immediately so idle latency is unchanged.
+
+    ``backend`` selects the runtime: ``"torch"`` (PyTorch) or ``"onnx"``
+    (ONNX Runtime, optionally with the int8 dynamically quantized export).
+    """
+
+    def __init__(
+        self,
+        model_name: str = EMBEDDING_MODEL_NAME,
+        batch_window_ms: float = 5,
+        max_batch_size: int = 32,
+        disk_cache: Optional[EmbeddingDiskCache] = None,
+        backend: str = "torch",
+        onnx_quantized: bool = False,
+        onnx_file_name: Optional[str] = None,
+    ):
+        if backend not in ("torch", "onnx"):
+            raise ValueError(f"Unsupported embedding backend: {backend}")
+        self.model_name = model_name
+        self.backend = backend
+        self.onnx_file_name = onnx_file_name or (ONNX_QUANTIZED_FILE_NAME if onnx_quantized else ONNX_FILE_NAME)
+        self.disk_cache = disk_cache
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch_size = max(1, max_batch_size)
+        self._model: Optional["SentenceTransformer"] = None
+        self._model_lock = Lock()
+        self._queue: "Queue[Tuple[str, Future]]" = Queue()
+        self._worker: Optional[Thread] = None
+        self._worker_lock = Lock()
+        self._waiting = 0
+        self._waiting_lock = Lock()
+
+    @property
+    def variant(self) -> str:
+        """Model + runtime identifier; vectors from different runtimes are not mixed in caches."""
+        if self.backend == "onnx":
+            return f"{self.model_name}:onnx:{self.onnx_file_name}"
+        return self.model_name
+
+    def load_model(self) -> "SentenceTransformer":
+        # Imported here: torch alone adds seconds to worker boot
+        from sentence_transformers import SentenceTransformer
+
+        if self.backend == "onnx":
+            return SentenceTransformer(
+                self.model_name,
+                backend="onnx",
+                model_kwargs={"file_name": self.onnx_file_name},
+            )
+        return SentenceTransformer(self.model_name)
+
+    @property
+    def model(self) -> "SentenceTransformer":
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = self.load_model()
+        return self._model
+
+    @property
+    def tokenizer(self):
+        return self.model.tokenizer
+
+    @property
+    def max_tokens(self) -> int:
+        """Longest input the model encodes without truncation, excluding special tokens."""
+        return self.model.max_seq_length - 2
+
+    def encode_batch(self, texts: List[str]) -> List[List[float]]:
+        """Encode a list of texts in a single call to the model."""
+        if not texts:
+            return []
+        return self.model.encode(texts, batch_size=config.EMBEDDING_BATCH_SIZE).tolist()
+
+    def encode_documents(self, texts: List[str]) -> List[List[float]]:
+        """Encode document texts, reusing vectors from the disk cache when possible."""
+        if self.disk_cache is None or not texts:
+            return self.encode_batch(texts)
+
+        vectors = self.disk_cache.get_many(self.variant, texts)
+        missing = [index for index, vector in enumerate(vectors) if vector is None]
+        if missing:
+            missing_texts = [texts[index] for index in missing]
+            encoded = self.encode_batch(missing_texts)
+            self.disk_cache.set_many(self.variant, missing_texts, encoded)
+            for index, vector in zip(missing, encoded):
+                vectors[index] = vector
+        return vectors
+
+    def encode_query(self, text: str) -> List[float]:
+        """Encode one text, sharing the model call with concurrent callers."""
+        if self.batch_window <= 0:
+            return self.encode_batch([text])[0]
+        return self._submit(text).result()
+
+    async def encode_query_async(self, text: str) -> List[float]:
+        """Awaitable ``encode_query`` that does not hold a thread while waiting."""
+        if self.batch_window <= 0:
+            return (await asyncio.to_thread(self.encode_batch, [text]))[0]
+        return await asyncio.wrap_future(self._submit(text))
+
+    def _submit(self, text: str) -> Future:
+        self._ensure_worker()
+        future: Future = Future()
+        with self._waiting_lock:
+            self._waiting += 1
+        future.add_done_callback(self._release_waiter)
+        self._queue.put((text, future))
+        return future
+
+    def _release_waiter(self, _future: Future) -> None:
+        with self._waiting_lock:
+            self._waiting -= 1
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None:
+            return
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect_batch(self) -> List[Tuple[str, Future]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.batch_window
+
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except Empty:
+                pass
+
+            # Only hold the batch open while other callers are still on their way
+            with self._waiting_lock:
+                others_pending = self._waiting > len(batch)
+            remaining = deadline - time.monotonic()
+            if not others_pending or remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except Empty:
+                break
+
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            # Callers that gave up while queued (a cancelled await) are skipped;
+            # the rest are marked running, so they can no longer be cancelled
+            batch = [
+                (text, future) for text, future in self._collect_batch() if future.set_running_or_notify_cancel()
+            ]
+            if not batch:
+                continue
+            try:
+                vectors = self.encode_batch([text for text, _ in batch])
+            except Exception as exc:
+                for _, future in batch:
+                    future.set_exception(exc)
+                continue
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+
+embedding_service = EmbeddingService(
+    batch_window_ms=config.EMBEDDING_BATCH_WINDOW_MS,
+    max_batch_size=config.EMBEDDING_BATCH_SIZE,
+    disk_cache=EmbeddingDiskCache(
+        config.EMBEDDING_CACHE_PATH, max_rows=config.EMBEDDING_CACHE_MAX_ROWS
+    ) if config.EMBEDDING_CACHE_PATH else None,
+    backend=config.EMBEDDING_BACKEND,
+    onnx_quantized=config.EMBEDDING_ONNX_QUANTIZED,
+    onnx_file_name=config.EMBEDDING_ONNX_FILE,
+)
@@ -0,0 +1,160 @@
+"""
+Bounded background job queue for work that must stay off the event loop
+"""
+
+import contextvars
+import logging
+import time
+import uuid
+from concurrent.futures import Future
+from queue import Full, Queue
+from threading import Lock, Thread
+from typing import Any, Callable, Dict, List, Optional
+
+from cachetools import TTLCache
+from fastapi import HTTPException
+
+from cache import RedisCacheBackend
+from metrics import profiled, record_stage
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFull(Exception):
+    """Raised when the queue already holds ``max_pending`` jobs."""
+
+
+class JobQueue:
+    """Jobs run on a fixed pool of worker threads behind a bounded queue.
+
+    Each job function is called with a ``progress(stage, fraction)`` keyword
+    argument it can use to report how far along it is. Jobs run in a copy of
+    the submitter's context, so stage timings reach its Server-Timing header.
+    Job records (status, progress, result or error) are kept for
+    ``ttl_seconds`` after submission. With a shared ``backend`` (e.g.
+    ``RedisCacheBackend``) every record change is also written there, so a
+    status poll answered by another worker process still finds the job;
+    without one, polls must reach the process that accepted the job.
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        max_pending: int = 16,
+        ttl_seconds: int = 3600,
+        name: str = "job-worker",
+        backend: Optional[RedisCacheBackend] = None,
+    ):
+        self.workers = max(1, workers)
+        self.name = name
+        self.queue: Queue = Queue(maxsize=max_pending)
+        self.jobs = TTLCache(maxsize=4096, ttl=ttl_seconds)
+        self.backend = backend
+        self.lock = Lock()
+        self._threads: List[Thread] = []
+
+    def _ensure_workers(self) -> None:
+        if self._threads:
+            return
+        with self.lock:
+            if not self._threads:
+                for index in range(self.workers):
+                    thread = Thread(target=self._run, name=f"{self.name}-{index}", daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+
+    def submit(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> str:
+        """Queue ``func`` and return its job id, or raise JobQueueFull."""
+        self._ensure_workers()
+        job_id = str(uuid.uuid4())
+        job = {
+            "job_id": job_id,
+            "status": "queued",
+            "stage": "queued",
+            "progress": 0.0,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+        }
+        future: Future = Future()
+        with self.lock:
+            self.jobs[job_id] = (job, future)
+        try:
+            self.queue.put_nowait((job_id, contextvars.copy_context(), func, args, kwargs))
+        except Full:
+            with self.lock:
+                self.jobs.pop(job_id, None)
+            raise JobQueueFull(f"{self.queue.maxsize} jobs are already pending")
+        self._share(job_id, dict(job))
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            entry = self.jobs.get(job_id)
+            if entry:
+                return dict(entry[0])
+        return self.backend.get(job_id) if self.backend is not None else None
+
+    def future(self, job_id: str) -> Optional[Future]:
+        """Future resolved with the job result, for callers that want to wait."""
+        with self.lock:
+            entry = self.jobs.get(job_id)
+            return entry[1] if entry else None
+
+    def _update(self, job_id: str, **fields: Any) -> None:
+        with self.lock:
+            entry = self.jobs.get(job_id)
+            if not entry:
+                return
+            entry[0].update(fields)
+            job = dict(entry[0])
+        # Each job's updates come from one thread at a time, so writes stay in order
+        self._share(job_id, job)
+
+    def _share(self, job_id: str, job: Dict[str, Any]) -> None:
+        if self.backend is None:
+            return
+        try:
+            self.backend.set(job_id, job)
+        except Exception:
+            # Polls on this process still work; keep the worker thread alive
+            logger.exception("Could not share the record of job %s", job_id)
+
+    def _run(self) -> None:
+        while True:
+            job_id, context, func, args, kwargs = self.queue.get()
+            started_at = time.time()
+            self._update(job_id, status="running", stage="started", started_at=started_at)
+            future = self.future(job_id)
+            # A waiter that gave up cancels the future; the job itself still runs
+            if future is not None and not future.set_running_or_notify_cancel():
+                future = None
+            job = self.get(job_id)
+            if job is not None:
+                context.run(record_stage, "queue_wait", started_at - job["created_at"])
+
+            def progress(stage: str, fraction: float, job_id: str = job_id) -> None:
+                self._update(job_id, stage=stage, progress=round(min(1.0, max(0.0, fraction)), 3))
+
+            try:
+                result = context.run(profiled, func, *args, progress=progress, **kwargs)
+            except Exception as exc:
+                detail = exc.detail if isinstance(exc, HTTPException) else str(exc)
+                self._update(job_id, status="failed", error=detail, finished_at=time.time())
+                if future is not None:
+                    future.set_exception(exc)
+            else:
+                self._update(
+                    job_id,
+                    status="completed",
+                    stage="done",
+                    progress=1.0,
+                    result=result,
+                    finished_at=time.time(),
+                )
+                if future is not None:
+                    future.set_result(result)
+            finally:
+                self.queue.task_done()
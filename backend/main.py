@@ -1,8 +1,55 @@
-from fastapi import FastAPI
+import time
+
+_boot_started = time.perf_counter()
+
+import asyncio
+import cProfile
+import io
+import logging
+import os
+import pstats
+from contextlib import asynccontextmanager
+from threading import Event, Lock
+from typing import List
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+import config
+from metrics import (
+    REQUEST_SECONDS,
+    ProfilingExecutor,
+    metrics,
+    reset_request_profiles,
+    reset_request_timings,
+    server_timing_header,
+    start_request_profiles,
+    start_request_timings,
+)
+from registry import registry
 from routes import documents, query,chat
 
-app = FastAPI(title="Gemini + Chroma Cloud RAG Backend")
+logging.basicConfig(level=config.LOG_LEVEL)
+logger = logging.getLogger(__name__)
+registry.boot_timings["imports"] = round(time.perf_counter() - _boot_started, 3)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if config.PROFILING_ENABLED:
+        # Profiled requests also profile what they hand to asyncio.to_thread
+        asyncio.get_running_loop().set_default_executor(ProfilingExecutor())
+    # Warm up in the background, retrying until it succeeds: /health/ answers at once, /ready once warm
+    stop_warm_up = Event()
+    warm_up = asyncio.create_task(asyncio.to_thread(registry.warm_up_until_ready, stop_warm_up))
+    yield
+    stop_warm_up.set()
+    if not warm_up.done():
+        warm_up.cancel()
+
+
+app = FastAPI(title="Gemini + Chroma Cloud RAG Backend", lifespan=lifespan)
 
 # Add CORS middleware to handle requests from Ballerina backend
 app.add_middleware(
@@ -13,6 +60,68 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# cProfile supports one active profiler per thread; concurrent requests skip profiling
+_profile_lock = Lock()
+
+
+def _save_profile(profiler: cProfile.Profile, worker_profiles: List[cProfile.Profile], request: Request) -> str:
+    """Merge the event-loop profile with the request's worker-thread profiles and save it."""
+    os.makedirs(config.PROFILE_DIR, exist_ok=True)
+    name = request.url.path.strip("/").replace("/", "_") or "root"
+    path = os.path.join(config.PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{name}.prof")
+    summary = io.StringIO()
+    stats = pstats.Stats(profiler, stream=summary)
+    if worker_profiles:
+        stats.add(*worker_profiles)
+    stats.dump_stats(path)
+
+    stats.sort_stats("cumulative").print_stats(15)
+    logger.info("Profile of %s %s saved to %s\n%s", request.method, request.url.path, path, summary.getvalue())
+    return path
+
+
+def _route_label(request: Request) -> str:
+    """Request path with path parameters put back as placeholders (bounded label cardinality)."""
+    if request.scope.get("route") is None:
+        return "unmatched"
+    path = request.url.path
+    for name, value in request.path_params.items():
+        path = path.replace(str(value), "{" + name + "}")
+    return path
+
+
+@app.middleware("http")
+async def instrument(request: Request, call_next):
+    """Record request latency, expose stage timings as Server-Timing and optionally profile."""
+    started = time.perf_counter()
+    timings, token = start_request_timings()
+    profiler = None
+    if config.PROFILING_ENABLED and request.headers.get("x-profile") == "1" and _profile_lock.acquire(blocking=False):
+        worker_profiles, profiles_token = start_request_profiles()
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        response = await call_next(request)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            reset_request_profiles(profiles_token)
+            _profile_lock.release()
+        reset_request_timings(token)
+
+    elapsed = time.perf_counter() - started
+    REQUEST_SECONDS.observe(
+        elapsed,
+        method=request.method,
+        route=_route_label(request),
+        status=str(response.status_code),
+    )
+    response.headers["Server-Timing"] = server_timing_header(timings, elapsed)
+    if profiler is not None:
+        response.headers["X-Profile-File"] = await asyncio.to_thread(_save_profile, profiler, list(worker_profiles), request)
+    return response
+
+
 app.include_router(documents.router, prefix="/documents", tags=["Documents"])
 app.include_router(query.router, prefix="/query", tags=["Query"])
 app.include_router(chat.router, prefix="/qa", tags=["Chat"])
@@ -25,3 +134,27 @@ def root():
 @app.get("/health/")
 def health():
     return {"status": "ok"}
+
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """Prometheus scrape endpoint: request/stage latency histograms, cache and LLM token counters."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/ready")
+def ready():
+    """Readiness probe: passes only after clients are connected and the model is warm."""
+    if registry.ready:
+        return {"status": "ready", "boot_timings": registry.boot_timings}
+    # Failed attempts are retried with backoff until warm-up succeeds
+    status = "retrying" if registry.warm_up_error else "warming_up"
+    return JSONResponse(
+        status_code=503,
+        content={
+            "status": status,
+            "error": registry.warm_up_error,
+            "attempts": registry.warm_up_attempts,
+            "boot_timings": registry.boot_timings,
+        },
+    )
@@ -0,0 +1,241 @@
+"""
+In-process metrics: counters, per-stage latency histograms and Server-Timing
+"""
+
+import cProfile
+import sys
+import time
+from bisect import bisect_left
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Stage timings of the request being served, rendered as its Server-Timing header
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+# Profiles of the worker-thread calls made for the request being profiled
+_request_profiles: ContextVar[Optional[List[cProfile.Profile]]] = ContextVar("request_profiles", default=None)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = Lock()
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self.values.get(tuple(labels.get(name, "") for name in self.labelnames), 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.lock = Lock()
+        # labels -> (per-bucket counts incl. +Inf, sum)
+        self.series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key, (counts, total) in sorted(self.series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = 'le="+Inf"' if bound == float("inf") else f'le="{bound:g}"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {total[0]:.6f}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: List = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format (0.0.4)."""
+        lines: List[str] = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+REQUEST_SECONDS = metrics.histogram(
+    "rag_request_seconds", "HTTP request latency", ("method", "route", "status")
+)
+STAGE_SECONDS = metrics.histogram(
+    "rag_stage_seconds", "Latency of one pipeline stage", ("stage",)
+)
+CACHE_REQUESTS = metrics.counter(
+    "rag_cache_requests_total", "Cache lookups by cache and result (hit/miss)", ("cache", "result")
+)
+LLM_TOKENS = metrics.counter(
+    "rag_llm_tokens_total", "Gemini tokens by call and kind (prompt/completion)", ("call", "kind")
+)
+LLM_ERRORS = metrics.counter(
+    "rag_llm_errors_total", "Failed Gemini calls", ("call",)
+)
+CHROMA_WRITE_RECORDS = metrics.counter(
+    "rag_chroma_write_records_total", "Records upserted into Chroma", ("collection",)
+)
+CHROMA_WRITE_BATCHES = metrics.counter(
+    "rag_chroma_write_batches_total", "Chroma write batches by result (ok/failed)", ("collection", "result")
+)
+CHROMA_WRITE_RETRIES = metrics.counter(
+    "rag_chroma_write_retries_total", "Chroma write batches retried after an error", ("collection",)
+)
+CHROMA_WRITE_SECONDS = metrics.histogram(
+    "rag_chroma_write_seconds", "Latency of one Chroma write batch, retries included", ("collection",)
+)
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Time a block into ``rag_stage_seconds`` and the current request's Server-Timing."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def record_llm_usage(call: str, response) -> None:
+    """Count prompt and completion tokens from a Gemini response's ``usage_metadata``."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    LLM_TOKENS.inc(getattr(usage, "prompt_token_count", 0) or 0, call=call, kind="prompt")
+    LLM_TOKENS.inc(getattr(usage, "candidates_token_count", 0) or 0, call=call, kind="completion")
+
+
+def start_request_timings() -> Tuple[List[Tuple[str, float]], object]:
+    timings: List[Tuple[str, float]] = []
+    return timings, _request_timings.set(timings)
+
+
+def reset_request_timings(token) -> None:
+    _request_timings.reset(token)
+
+
+def request_timings_ms() -> Dict[str, float]:
+    """Stage timings recorded so far for the current request, in ms (repeated stages summed).
+
+    Streamed responses send their headers before most stages run, so they
+    report these in the body instead.
+    """
+    totals: Dict[str, float] = {}
+    for stage, seconds in _request_timings.get() or []:
+        totals[stage] = totals.get(stage, 0.0) + seconds * 1000
+    return {stage: round(ms, 1) for stage, ms in totals.items()}
+
+
+def start_request_profiles() -> Tuple[List[cProfile.Profile], object]:
+    profiles: List[cProfile.Profile] = []
+    return profiles, _request_profiles.set(profiles)
+
+
+def reset_request_profiles(token) -> None:
+    _request_profiles.reset(token)
+
+
+def _profiled_call(profiles: Optional[List[cProfile.Profile]], func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    # A thread that is already profiled (e.g. the event loop) keeps its profiler
+    if profiles is None or sys.getprofile() is not None:
+        return func(*args, **kwargs)
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        profiles.append(profiler)
+
+
+def profiled(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Call ``func``, under its own profiler when the current request is being profiled."""
+    return _profiled_call(_request_profiles.get(), func, *args, **kwargs)
+
+
+class ProfilingExecutor(ThreadPoolExecutor):
+    """Default event-loop executor that profiles work submitted by a profiled request.
+
+    ``asyncio.to_thread`` submits from the caller's context, so the request's
+    profile list is looked up at submit time rather than in the worker thread.
+    """
+
+    def submit(self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future:
+        profiles = _request_profiles.get()
+        if profiles is None:
+            return super().submit(fn, *args, **kwargs)
+        return super().submit(_profiled_call, profiles, fn, *args, **kwargs)
+
+
+def server_timing_header(timings: List[Tuple[str, float]], total_seconds: float) -> str:
+    entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings]
+    entries.append(f"total;dur={total_seconds * 1000:.1f}")
+    return ", ".join(entries)
@@ -1,6 +1,6 @@
 from typing import List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class ChatRequest(BaseModel):
@@ -13,4 +13,16 @@ class ChatRequest(BaseModel):
 class ChatResponse(BaseModel):
     answer: str
     sources: List[str] = []
-    confidence: Optional[float] = None
\ No newline at end of file
+    confidence: Optional[float] = None
+    context_tokens_saved: Optional[int] = None
+
+
+class BatchChatRequest(BaseModel):
+    document_id: str
+    questions: List[str] = Field(..., min_length=1)
+    conversation_id: Optional[str] = None
+    top_k: int = 3
+
+
+class BatchChatResponse(BaseModel):
+    results: List[ChatResponse] = []
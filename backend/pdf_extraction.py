@@ -0,0 +1,141 @@
+"""
+Windowed PDF text extraction from a memory-mapped file
+"""
+
+import mmap
+import multiprocessing
+import os
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+from typing import Deque, Iterator, List, Optional, Tuple
+
+import PyPDF2
+
+import config
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_lock = Lock()
+
+
+class MappedPdf:
+    """PdfReader over a read-only memory map of a PDF file.
+
+    Pages are read straight from the page cache, so the file is never
+    copied into the process as one bytes object. ``extract`` drops PyPDF2's
+    parsed-object cache after each page range: a reader kept open across a
+    long document holds its page tree, not the content of every page read.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as handle:
+            self.view = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self.reader = PyPDF2.PdfReader(self.view)
+        except Exception:
+            self.view.close()
+            raise
+
+    @property
+    def page_count(self) -> int:
+        return len(self.reader.pages)
+
+    def extract(self, start: int, end: int) -> List[str]:
+        pages = [self.reader.pages[index].extract_text() or "" for index in range(start, end)]
+        self.reader.resolved_objects.clear()
+        return pages
+
+    def close(self) -> None:
+        self.view.close()
+
+    def __enter__(self) -> "MappedPdf":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+# Pool side of iter_pdf_pages: documents stay open between windows so each
+# worker parses a document's page tree once, not once per window
+_worker_pdfs: "OrderedDict[tuple, MappedPdf]" = OrderedDict()
+WORKER_OPEN_PDFS = 2
+
+
+def _close_stale_pdfs() -> None:
+    """Unmap files deleted or replaced since they were opened, such as discarded spool files.
+
+    A mapping keeps a deleted file's disk space allocated until it is closed.
+    """
+    for key in list(_worker_pdfs):
+        path, size, mtime_ns = key
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            stale = True
+        else:
+            stale = (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns)
+        if stale:
+            _worker_pdfs.pop(key).close()
+
+
+def _extract_path_window(path: str, start: int, end: int) -> List[str]:
+    _close_stale_pdfs()
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    mapped = _worker_pdfs.pop(key, None) or MappedPdf(path)
+    _worker_pdfs[key] = mapped
+    while len(_worker_pdfs) > WORKER_OPEN_PDFS:
+        _worker_pdfs.popitem(last=False)[1].close()
+
+    pages = mapped.extract(start, end)
+    if end >= mapped.page_count:
+        _worker_pdfs.pop(key).close()
+    return pages
+
+
+def _get_process_pool(workers: int) -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        with _process_pool_lock:
+            if _process_pool is None:
+                # spawn: forking a process that already runs model threads is unsafe
+                _process_pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _process_pool
+
+
+def iter_pdf_pages(
+    mapped: MappedPdf,
+    window_pages: Optional[int] = None,
+    parallel_min_pages: Optional[int] = None,
+    workers: Optional[int] = None,
+) -> Iterator[str]:
+    """Yield the text of each page in order, holding only a few windows of pages.
+
+    Pages are extracted ``window_pages`` at a time from the caller's mapped
+    reader, so one parse serves the page count, first page and page stream.
+    Long documents (``parallel_min_pages``) spread windows over the process
+    pool with at most ``workers`` windows in flight.
+    """
+    window_pages = max(1, config.PDF_STREAM_WINDOW_PAGES if window_pages is None else window_pages)
+    parallel_min_pages = config.PDF_PARALLEL_MIN_PAGES if parallel_min_pages is None else parallel_min_pages
+    workers = config.PDF_EXTRACT_WORKERS if workers is None else workers
+
+    page_count = mapped.page_count
+    windows = [(start, min(start + window_pages, page_count)) for start in range(0, page_count, window_pages)]
+
+    if workers > 1 and page_count >= parallel_min_pages > 0:
+        pool = _get_process_pool(workers)
+        in_flight: Deque = deque()
+        for start, end in windows:
+            in_flight.append(pool.submit(_extract_path_window, mapped.path, start, end))
+            if len(in_flight) >= workers:
+                yield from in_flight.popleft().result()
+        while in_flight:
+            yield from in_flight.popleft().result()
+    else:
+        for start, end in windows:
+            yield from mapped.extract(start, end)
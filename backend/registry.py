@@ -0,0 +1,146 @@
+"""
+Lazily initialised clients and models shared by every router, plus warm-up
+"""
+
+import logging
+import time
+from threading import Event, Lock
+from typing import Any, Callable, Dict, Optional
+
+import config
+from cache import create_redis_client
+from db import get_chroma_client
+from embedding_service import embedding_service
+from search_index import search_index
+
+logger = logging.getLogger(__name__)
+
+
+class Registry:
+    """Process-wide holder of the Chroma client, collections and Redis client.
+
+    Nothing connects or loads at import time. Each resource is created on
+    first use, or up front by ``warm_up``, which also records how long each
+    boot step took and flips ``ready`` once everything answered. The server
+    repeats warm-up with backoff (``warm_up_until_ready``) so a transient
+    error at boot does not keep it unready.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self._chroma_client = None
+        self._collections: Dict[str, Any] = {}
+        self._redis_client = None
+        self._redis_initialised = False
+        self.ready = False
+        self.warm_up_error: Optional[str] = None
+        self.warm_up_attempts = 0
+        self.boot_timings: Dict[str, float] = {}
+
+    @property
+    def chroma_client(self):
+        if self._chroma_client is None:
+            with self.lock:
+                if self._chroma_client is None:
+                    self._chroma_client = get_chroma_client()
+        return self._chroma_client
+
+    def use_chroma_client(self, client) -> None:
+        """Swap in another Chroma client, e.g. ``chromadb.EphemeralClient()`` for offline benchmarks."""
+        with self.lock:
+            self._chroma_client = client
+            self._collections.clear()
+
+    def get_collection(self, name: str):
+        collection = self._collections.get(name)
+        if collection is None:
+            client = self.chroma_client
+            with self.lock:
+                collection = self._collections.get(name)
+                if collection is None:
+                    collection = client.get_or_create_collection(name)
+                    self._collections[name] = collection
+        return collection
+
+    @property
+    def collection(self):
+        return self.get_collection(config.CHROMA_COLLECTION)
+
+    @property
+    def summary_collection(self):
+        return self.get_collection(config.SUMMARIES_COLLECTION)
+
+    @property
+    def redis_client(self):
+        if not self._redis_initialised:
+            with self.lock:
+                if not self._redis_initialised:
+                    self._redis_client = create_redis_client(config.REDIS_URL)
+                    self._redis_initialised = True
+        return self._redis_client
+
+    def _timed(self, step: str, func: Callable[[], Any]) -> Any:
+        started = time.perf_counter()
+        result = func()
+        self.boot_timings[step] = round(time.perf_counter() - started, 3)
+        return result
+
+    def _connect_chroma(self) -> None:
+        self._timed("chroma_client", lambda: self.chroma_client)
+        self._timed("chroma_ping", self.chroma_client.heartbeat)
+        self._timed("chroma_collections", lambda: (self.collection, self.summary_collection))
+
+    def check_chroma(self) -> bool:
+        """Ping Chroma and open both collections; on failure the error is kept in ``warm_up_error``."""
+        try:
+            self._connect_chroma()
+        except Exception as exc:
+            self.warm_up_error = str(exc)
+            logger.warning("Chroma check failed: %s", exc)
+            return False
+        return True
+
+    def warm_up(self) -> bool:
+        """Connect to Chroma (and Redis), load the embedding model, run a dummy encode and replay the search index.
+
+        Returns whether every step succeeded; the error is kept in ``warm_up_error``.
+        """
+        self.warm_up_attempts += 1
+        try:
+            self._connect_chroma()
+            if self.redis_client is not None:
+                self._timed("redis_ping", self.redis_client.ping)
+            self._timed("embedding_model_load", lambda: embedding_service.model)
+            self._timed("embedding_dummy_encode", lambda: embedding_service.encode_batch(["warm-up"]))
+            self._timed("search_index_load", search_index.load)
+        except Exception as exc:
+            self.warm_up_error = str(exc)
+            if self.warm_up_attempts == 1:
+                logger.exception("Warm-up failed after %s", self.boot_timings)
+            else:
+                logger.warning("Warm-up attempt %d failed: %s", self.warm_up_attempts, exc)
+            return False
+
+        self.warm_up_error = None
+        self.ready = True
+        logger.info(
+            "Warm-up complete in %.3fs: %s",
+            sum(self.boot_timings.values()),
+            ", ".join(f"{step}={seconds:.3f}s" for step, seconds in self.boot_timings.items()),
+        )
+        return True
+
+    def warm_up_until_ready(self, stop: Event, initial_delay: float = 1.0, max_delay: float = 30.0) -> None:
+        """Repeat ``warm_up`` with exponential backoff until it succeeds or ``stop`` is set.
+
+        The clients are created lazily, so once Chroma or Redis is back a
+        later attempt succeeds and ``/ready`` starts passing.
+        """
+        delay = initial_delay
+        while not self.warm_up():
+            if stop.wait(delay):
+                return
+            delay = min(delay * 2, max_delay)
+
+
+registry = Registry()
@@ -1,34 +1,118 @@
-from typing import List, Optional
+import asyncio
+import json
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
 
 import google.generativeai as genai
-from fastapi import APIRouter, Request
-from sentence_transformers import SentenceTransformer
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 
 import config
-from cache import MemoryStore, SimpleTTLCache, make_cache_key
-from db import get_chroma_client
-from models.chat_models import ChatRequest, ChatResponse
+from cache import (
+    MemoryStore,
+    RedisCacheBackend,
+    RedisMemoryBackend,
+    SemanticCache,
+    SimpleTTLCache,
+    SingleFlight,
+    make_cache_key,
+)
+from context_builder import AssembledContext, assemble_context, passages_from_results
+from embedding_service import embedding_service
+from metrics import LLM_ERRORS, record_cache, record_llm_usage, record_stage, request_timings_ms, timed
+from models.chat_models import BatchChatRequest, BatchChatResponse, ChatRequest, ChatResponse
+from registry import registry
+from vector_index import DocumentVectors, LocalVectorIndex
 
 router = APIRouter()
-client = get_chroma_client()
-collection = client.get_or_create_collection(config.CHROMA_COLLECTION)
-summary_collection = client.get_or_create_collection(config.SUMMARIES_COLLECTION)
+
+
+def chunks_fully_stored(document_id: str, vectors: DocumentVectors) -> bool:
+    """Whether every chunk of the document is stored, so its vectors can be cached.
+
+    Summary sections are written after all chunks and record their count;
+    a document still being ingested has no sections yet.
+    """
+    sections = registry.summary_collection.get(
+        where={"document_base_id": document_id}, include=["metadatas"], limit=1
+    )
+    section_metadatas = sections.get("metadatas") or []
+    if not section_metadatas:
+        return False
+    total_chunks = section_metadatas[0].get("total_chunks")  # absent for documents stored before it was added
+    return total_chunks is None or total_chunks == len(vectors.ids)
+
+
+# Hot documents are searched in memory instead of round-tripping to Chroma Cloud
+chunk_index = LocalVectorIndex(
+    lambda: registry.collection,
+    max_bytes=config.LOCAL_INDEX_MAX_MB * 1024 * 1024,
+    is_complete=chunks_fully_stored,
+)
+summary_index = LocalVectorIndex(
+    lambda: registry.summary_collection,
+    max_bytes=config.LOCAL_INDEX_MAX_MB * 1024 * 1024 // 8,
+)
 
 genai.configure(api_key=config.GEMINI_API_KEY)
-embedding_model = SentenceTransformer("sentence-transformers/all-mpnet-base-v2")
 
-# Cache layer
-response_cache = SimpleTTLCache(max_size=256, ttl_seconds=config.CACHE_TTL_SECONDS)
+CHAT_MODEL = "gemini-2.5-flash"
+GENERATION_CONFIG = genai.types.GenerationConfig(
+    temperature=0.2,
+    max_output_tokens=400,
+)
+
+# Cache layer (shared through Redis when REDIS_URL is set)
+redis_client = registry.redis_client
+response_cache = SimpleTTLCache(
+    max_size=256,
+    ttl_seconds=config.CACHE_TTL_SECONDS,
+    backend=RedisCacheBackend(
+        redis_client,
+        namespace=f"{config.REDIS_KEY_PREFIX}:response",
+        ttl_seconds=config.CACHE_TTL_SECONDS,
+    ) if redis_client else None,
+    near_ttl_seconds=config.CACHE_NEAR_TTL_SECONDS,
+    name="response",
+)
 memory_store = MemoryStore(
     max_conversations=256,
     ttl_seconds=config.MEMORY_TTL_SECONDS,
     max_messages=config.MEMORY_MAX_MESSAGES,
+    max_tokens=config.MEMORY_TOKEN_BUDGET,
+    summary_max_tokens=config.MEMORY_SUMMARY_MAX_TOKENS,
+    backend=RedisMemoryBackend(
+        redis_client,
+        namespace=f"{config.REDIS_KEY_PREFIX}:memory",
+        ttl_seconds=config.MEMORY_TTL_SECONDS,
+        max_messages=config.MEMORY_MAX_MESSAGES,
+        max_tokens=config.MEMORY_TOKEN_BUDGET,
+        summary_max_tokens=config.MEMORY_SUMMARY_MAX_TOKENS,
+    ) if redis_client else None,
 )
+inflight_answers = SingleFlight(timeout_seconds=config.SINGLE_FLIGHT_TIMEOUT_SECONDS, name="inflight")
+semantic_cache = SemanticCache(
+    similarity_threshold=config.SEMANTIC_CACHE_THRESHOLD,
+    max_entries_per_document=config.SEMANTIC_CACHE_MAX_ENTRIES,
+    ttl_seconds=config.SEMANTIC_CACHE_TTL_SECONDS,
+)
+
+
+async def get_free_embedding_async(text: str):
+    """Embed a question with the shared service, awaiting the micro-batcher instead of blocking a thread."""
+    return await embedding_service.encode_query_async(text)
 
 
-def get_free_embedding(text: str):
-    """Generate embeddings using free SentenceTransformers."""
-    return embedding_model.encode(text).tolist()
+async def offload(func, *args):
+    """Run cache/memory calls off the event loop when they go over the network (Redis)."""
+    if redis_client is None:
+        return func(*args)
+    return await asyncio.to_thread(func, *args)
+
+
+async def remember_turn(conversation_id: str, question: str, answer: str) -> None:
+    """Write a question and its answer to memory in one append."""
+    await offload(memory_store.append_many, conversation_id, [("user", question), ("assistant", answer)])
 
 
 def format_memory(history: List[tuple]) -> str:
@@ -36,7 +120,10 @@ def format_memory(history: List[tuple]) -> str:
         return ""
     formatted = []
     for role, content in history:
-        formatted.append(f"{role.capitalize()}: {content}")
+        if role == "summary":
+            formatted.append(f"(Earlier in this conversation) {content}")
+        else:
+            formatted.append(f"{role.capitalize()}: {content}")
     return "\n".join(formatted)
 
 
@@ -57,77 +144,366 @@ def build_prompt(context_chunks: List[str], history: List[tuple], question: str)
     )
 
 
-@router.post("/ask", response_model=ChatResponse)
-def chat_endpoint(req: ChatRequest, request: Request):
-    conversation_id = req.conversation_id or make_cache_key(req.document_id, request.client.host)
+def resolve_conversation_id(req: Union[ChatRequest, BatchChatRequest], request: Request) -> str:
+    return req.conversation_id or make_cache_key(req.document_id, request.client.host)
 
-    history = memory_store.get_history(conversation_id)
-    memory_store.append(conversation_id, "user", req.question)
 
-    cache_key = make_cache_key(req.document_id, req.question)
-    cached: Optional[ChatResponse] = response_cache.get(cache_key)
-    if cached:
-        memory_store.append(conversation_id, "assistant", cached.answer)
-        return cached
+def lookup_semantic_cache(req: ChatRequest, cache_key: str, query_embedding: List[float]) -> Optional[ChatResponse]:
+    """Reuse the answer to a paraphrase of an already answered question."""
+    semantic_hit, _ = semantic_cache.get(req.document_id, query_embedding)
+    record_cache("semantic", semantic_hit is not None)
+    if semantic_hit:
+        response_cache.set(cache_key, semantic_hit)
+    return semantic_hit
+
+
+async def query_index(index: LocalVectorIndex, document_id: str, query_embedding: List[float], n_results: int, stage: str) -> dict:
+    # Loaded documents are searched inline; a cold load goes to a thread while it waits on Chroma
+    with timed(stage):
+        if index.contains(document_id):
+            return index.query(document_id, query_embedding, n_results, include_embeddings=True)
+        return await asyncio.to_thread(index.query, document_id, query_embedding, n_results, True)
 
-    query_embedding = get_free_embedding(req.question)
-    results = collection.query(
-        query_embeddings=[query_embedding],
-        n_results=req.top_k,
-        where={"document_base_id": req.document_id},
-        include=["documents", "metadatas", "distances"],
+
+async def query_index_many(index: LocalVectorIndex, document_id: str, query_embeddings: List[List[float]], n_results: int, stage: str) -> dict:
+    with timed(stage):
+        if index.contains(document_id):
+            return index.query_many(document_id, query_embeddings, n_results, include_embeddings=True)
+        return await asyncio.to_thread(index.query_many, document_id, query_embeddings, n_results, True)
+
+
+def _result_row(results: dict, row: int) -> dict:
+    """One query's slice of a multi-query result, in single-query shape."""
+    return {field: [rows[row]] for field, rows in results.items()}
+
+
+def candidate_counts(top_k: int) -> Tuple[int, int]:
+    """Number of chunks and summary sections that go into the prompt."""
+    return top_k, max(2, top_k // 2)
+
+
+def build_context(
+    query_embedding: List[float],
+    results: dict,
+    summary_results: dict,
+    top_k: int,
+    history: List[tuple],
+) -> AssembledContext:
+    """Select what goes into the prompt from the over-fetched candidates.
+
+    Overlap, near-duplicates and the token budget decide what is actually sent.
+    """
+    n_chunks, n_summaries = candidate_counts(top_k)
+    chunks = passages_from_results(results, "chunk")
+    summaries = passages_from_results(summary_results, "summary")
+    # What used to be sent verbatim: the top_k chunks plus the nearest summaries
+    baseline = chunks[:n_chunks] + summaries[:n_summaries]
+
+    return assemble_context(
+        query_embedding,
+        chunks + summaries,
+        history,
+        baseline=baseline,
+        max_passages=n_chunks + n_summaries,
+        token_budget=config.CONTEXT_TOKEN_BUDGET,
+        memory_share=config.CONTEXT_MEMORY_SHARE,
+        mmr_lambda=config.CONTEXT_MMR_LAMBDA,
+        dedup_threshold=config.CONTEXT_DEDUP_THRESHOLD,
     )
 
-    docs = results.get("documents", [[]])[0] if results.get("documents") else []
-    distances = results.get("distances", [[]])[0] if results.get("distances") else []
 
-    # Pull summary embeddings to provide fast familiarization context
-    summary_results = summary_collection.query(
-        query_embeddings=[query_embedding],
-        n_results=max(2, req.top_k // 2),
-        where={"document_base_id": req.document_id},
-        include=["documents", "metadatas", "distances"],
+async def retrieve_context(req: ChatRequest, query_embedding: List[float], history: List[tuple]) -> AssembledContext:
+    """Retrieve candidates and assemble the context and memory that go into the prompt.
+
+    Chunk and summary retrieval run concurrently and over-fetch by
+    CONTEXT_CANDIDATE_MULTIPLIER.
+    """
+    n_chunks, n_summaries = candidate_counts(req.top_k)
+    multiplier = max(1, config.CONTEXT_CANDIDATE_MULTIPLIER)
+    results, summary_results = await asyncio.gather(
+        query_index(chunk_index, req.document_id, query_embedding, n_chunks * multiplier, "chunk_query"),
+        # Pull summary embeddings to provide fast familiarization context
+        query_index(summary_index, req.document_id, query_embedding, n_summaries * multiplier, "summary_query"),
     )
+    with timed("context"):
+        return build_context(query_embedding, results, summary_results, req.top_k, history)
+
 
-    summary_docs = summary_results.get("documents", [[]])[0] if summary_results.get("documents") else []
-    summary_distances = summary_results.get("distances", [[]])[0] if summary_results.get("distances") else []
+async def retrieve_contexts(
+    req: BatchChatRequest,
+    query_embeddings: List[List[float]],
+    history: List[tuple],
+) -> List[AssembledContext]:
+    """Like ``retrieve_context`` for many questions: one multi-query search per index."""
+    n_chunks, n_summaries = candidate_counts(req.top_k)
+    multiplier = max(1, config.CONTEXT_CANDIDATE_MULTIPLIER)
+    results, summary_results = await asyncio.gather(
+        query_index_many(chunk_index, req.document_id, query_embeddings, n_chunks * multiplier, "chunk_query"),
+        query_index_many(summary_index, req.document_id, query_embeddings, n_summaries * multiplier, "summary_query"),
+    )
+    with timed("context"):
+        return [
+            build_context(query_embedding, _result_row(results, row), _result_row(summary_results, row), req.top_k, history)
+            for row, query_embedding in enumerate(query_embeddings)
+        ]
 
-    combined_context = docs + summary_docs
-    combined_distances = distances + summary_distances
 
-    prompt = build_prompt(combined_context, history, req.question)
+def compute_confidence(distances: List[float]) -> Optional[float]:
+    """Approximate confidence: inverse of average distance (bounded 0..1)."""
+    if not distances:
+        return None
+    avg_distance = sum(distances) / len(distances)
+    return max(0.0, min(1.0, 1 - avg_distance))
 
-    try:
-        model = genai.GenerativeModel("gemini-2.5-flash")
-        response = model.generate_content(
-            prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.2,
-                max_output_tokens=400,
-            ),
-        )
 
-        answer_text = response.text
-        # Approximate confidence: inverse of average distance (bounded 0..1)
-        confidence = None
-        if combined_distances:
-            avg_distance = sum(combined_distances) / len(combined_distances)
-            confidence = max(0.0, min(1.0, 1 - avg_distance))
+def get_chat_model():
+    return genai.GenerativeModel(CHAT_MODEL)
 
-        chat_response = ChatResponse(
-            answer=answer_text,
-            sources=combined_context,
-            confidence=confidence,
-        )
 
-        memory_store.append(conversation_id, "assistant", answer_text)
-        response_cache.set(cache_key, chat_response)
-        return chat_response
+async def generate_answer(context: AssembledContext, question: str) -> Tuple[ChatResponse, bool]:
+    """Ask Gemini; returns the response and whether it is a real (cacheable) answer."""
+    with timed("prompt"):
+        prompt = build_prompt(context.texts, context.history, question)
+    try:
+        with timed("llm"):
+            response = await get_chat_model().generate_content_async(prompt, generation_config=GENERATION_CONFIG)
+        record_llm_usage("answer", response)
+        return ChatResponse(
+            answer=response.text,
+            sources=context.texts,
+            confidence=compute_confidence(context.distances),
+            context_tokens_saved=context.tokens_saved,
+        ), True
     except Exception as exc:  # keep the chat responsive on LLM errors
-        fallback = ChatResponse(
+        LLM_ERRORS.inc(call="answer")
+        return ChatResponse(
             answer=f"Sorry, I hit an error while answering: {exc}",
-            sources=docs,
+            sources=context.texts,
             confidence=None,
+        ), False
+
+
+async def cache_answer(
+    req: Union[ChatRequest, BatchChatRequest],
+    cache_key: str,
+    query_embedding: List[float],
+    chat_response: ChatResponse,
+) -> None:
+    await offload(response_cache.set, cache_key, chat_response)
+    semantic_cache.set(req.document_id, query_embedding, chat_response)
+
+
+async def answer_question(req: ChatRequest, cache_key: str, history: List[tuple]) -> ChatResponse:
+    """Semantic cache, retrieval and generation for a question that missed the exact cache."""
+    with timed("embed"):
+        query_embedding = await get_free_embedding_async(req.question)
+
+    with timed("semantic_cache"):
+        semantic_hit = await offload(lookup_semantic_cache, req, cache_key, query_embedding)
+    if semantic_hit:
+        return semantic_hit
+
+    context = await retrieve_context(req, query_embedding, history)
+    chat_response, answered = await generate_answer(context, req.question)
+    if answered:
+        await cache_answer(req, cache_key, query_embedding, chat_response)
+    return chat_response
+
+
+@router.post("/ask", response_model=ChatResponse)
+async def chat_endpoint(req: ChatRequest, request: Request):
+    conversation_id = resolve_conversation_id(req, request)
+
+    with timed("memory"):
+        history = await offload(memory_store.get_history, conversation_id)
+
+    cache_key = make_cache_key(req.document_id, req.question)
+    with timed("cache_lookup"):
+        cached: Optional[ChatResponse] = await offload(response_cache.get, cache_key)
+    if cached:
+        await remember_turn(conversation_id, req.question, cached.answer)
+        return cached
+
+    # Concurrent identical questions wait for the one already being answered
+    chat_response = await inflight_answers.run(cache_key, lambda: answer_question(req, cache_key, history))
+    await remember_turn(conversation_id, req.question, chat_response.answer)
+    return chat_response
+
+
+@router.post("/ask/batch", response_model=BatchChatResponse)
+async def chat_batch_endpoint(req: BatchChatRequest, request: Request):
+    """Answer several questions about one document, returned in the order asked.
+
+    Uncached questions are embedded in one encode call and searched with one
+    multi-query pass per index; at most BATCH_LLM_CONCURRENCY Gemini calls
+    are in flight. Answers share the response cache with ``/ask``.
+    """
+    if len(req.questions) > config.BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {config.BATCH_MAX_QUESTIONS} questions per batch")
+
+    conversation_id = resolve_conversation_id(req, request)
+    history = await offload(memory_store.get_history, conversation_id)
+
+    cache_keys = [make_cache_key(req.document_id, question) for question in req.questions]
+    results: List[Optional[ChatResponse]] = [await offload(response_cache.get, key) for key in cache_keys]
+
+    # Repeated questions within the batch are answered once
+    first_index: Dict[str, int] = {}
+    for index, (key, cached) in enumerate(zip(cache_keys, results)):
+        if cached is None:
+            first_index.setdefault(key, index)
+
+    if first_index:
+        indices = list(first_index.values())
+        with timed("embed"):
+            query_embeddings = await asyncio.to_thread(
+                embedding_service.encode_batch, [req.questions[index] for index in indices]
+            )
+
+        to_answer: List[Tuple[int, List[float]]] = []
+        for index, query_embedding in zip(indices, query_embeddings):
+            semantic_hit = await offload(lookup_semantic_cache, req, cache_keys[index], query_embedding)
+            if semantic_hit:
+                results[index] = semantic_hit
+            else:
+                to_answer.append((index, query_embedding))
+
+        if to_answer:
+            contexts = await retrieve_contexts(req, [query_embedding for _, query_embedding in to_answer], history)
+            semaphore = asyncio.Semaphore(max(1, config.BATCH_LLM_CONCURRENCY))
+
+            async def answer(index: int, query_embedding: List[float], context: AssembledContext) -> None:
+                async with semaphore:
+                    chat_response, answered = await generate_answer(context, req.questions[index])
+                if answered:
+                    await cache_answer(req, cache_keys[index], query_embedding, chat_response)
+                results[index] = chat_response
+
+            await asyncio.gather(*(
+                answer(index, query_embedding, context)
+                for (index, query_embedding), context in zip(to_answer, contexts)
+            ))
+
+    for index, key in enumerate(cache_keys):
+        if results[index] is None:
+            results[index] = results[first_index[key]]
+
+    messages: List[Tuple[str, str]] = []
+    for question, chat_response in zip(req.questions, results):
+        messages += [("user", question), ("assistant", chat_response.answer)]
+    await offload(memory_store.append_many, conversation_id, messages)
+
+    return BatchChatResponse(results=results)
+
+
+def format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/ask/stream")
+async def chat_stream_endpoint(req: ChatRequest, request: Request):
+    """Stream the answer as Server-Sent Events.
+
+    Emits ``token`` events as Gemini produces text and a final ``done`` event
+    carrying sources, confidence and the per-stage ``timings`` in ms. The
+    Server-Timing header is sent before the answer is generated, so it only
+    covers the stages that ran before the stream started. The full answer is written to memory and the
+    response cache once the stream completes.
+    """
+    conversation_id = resolve_conversation_id(req, request)
+
+    with timed("memory"):
+        history = await offload(memory_store.get_history, conversation_id)
+
+    cache_key = make_cache_key(req.document_id, req.question)
+
+    async def replay(cached: ChatResponse, cache_tier: str) -> AsyncIterator[str]:
+        await remember_turn(conversation_id, req.question, cached.answer)
+        yield format_sse("token", {"text": cached.answer})
+        yield format_sse("done", {
+            "sources": cached.sources,
+            "confidence": cached.confidence,
+            "cached": cache_tier,
+            "timings": request_timings_ms(),
+        })
+
+    async def generate() -> AsyncIterator[str]:
+        with timed("cache_lookup"):
+            cached: Optional[ChatResponse] = await offload(response_cache.get, cache_key)
+        if cached:
+            async for event in replay(cached, "exact"):
+                yield event
+            return
+
+        with timed("embed"):
+            query_embedding = await get_free_embedding_async(req.question)
+
+        with timed("semantic_cache"):
+            semantic_hit = await offload(lookup_semantic_cache, req, cache_key, query_embedding)
+        if semantic_hit:
+            async for event in replay(semantic_hit, "semantic"):
+                yield event
+            return
+
+        context = await retrieve_context(req, query_embedding, history)
+        with timed("prompt"):
+            prompt = build_prompt(context.texts, context.history, req.question)
+
+        answer_parts: List[str] = []
+        llm_started = time.perf_counter()
+        try:
+            stream = await get_chat_model().generate_content_async(
+                prompt,
+                generation_config=GENERATION_CONFIG,
+                stream=True,
+            )
+            async for chunk in stream:
+                try:
+                    text = chunk.text
+                except ValueError:  # e.g. a final chunk carrying only finish metadata
+                    continue
+                if text:
+                    if not answer_parts:
+                        record_stage("llm_first_token", time.perf_counter() - llm_started)
+                    answer_parts.append(text)
+                    yield format_sse("token", {"text": text})
+            record_stage("llm", time.perf_counter() - llm_started)
+            record_llm_usage("answer", stream)
+        except Exception as exc:  # keep the chat responsive on LLM errors
+            LLM_ERRORS.inc(call="answer")
+            answer = f"Sorry, I hit an error while answering: {exc}"
+            await remember_turn(conversation_id, req.question, answer)
+            yield format_sse("error", {"answer": answer, "sources": context.texts, "timings": request_timings_ms()})
+            return
+
+        chat_response = ChatResponse(
+            answer="".join(answer_parts),
+            sources=context.texts,
+            confidence=compute_confidence(context.distances),
+            context_tokens_saved=context.tokens_saved,
         )
-        memory_store.append(conversation_id, "assistant", fallback.answer)
-        return fallback
+        await remember_turn(conversation_id, req.question, chat_response.answer)
+        await cache_answer(req, cache_key, query_embedding, chat_response)
+        yield format_sse("done", {
+            "sources": chat_response.sources,
+            "confidence": chat_response.confidence,
+            "context_tokens_saved": chat_response.context_tokens_saved,
+            "cached": None,
+            "timings": request_timings_ms(),
+        })
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/cache/stats")
+def cache_stats():
+    """Hit/miss and similarity statistics for the semantic response cache."""
+    return {
+        "semantic_cache": semantic_cache.stats(),
+        "chunk_index": chunk_index.stats(),
+        "summary_index": summary_index.stats(),
+    }
@@ -1,38 +1,192 @@
-import io
+import asyncio
+import hashlib
 import json
-import uuid
-from datetime import datetime
-from typing import List, Optional
+import os
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Callable, Deque, Iterable, Iterator, List, Optional, Tuple
 
 import google.generativeai as genai
-import PyPDF2
 from fastapi import APIRouter, File, HTTPException, UploadFile
-from sentence_transformers import SentenceTransformer
+from fastapi.concurrency import run_in_threadpool
 
 import config
-from db import get_chroma_client
-from summary_extractor import generate_summary_from_first_page
+from cache import RedisCacheBackend, SimpleTTLCache, content_hash, file_content_hash
+from chroma_writer import ChromaWriteError, chroma_writer
+from chunking import iter_token_chunks
+from embedding_service import EMBEDDING_MODEL_NAME, embedding_service
+from jobs import JobQueue, JobQueueFull
+from pdf_extraction import MappedPdf, iter_pdf_pages
+from metrics import record_stage, timed
+from registry import registry
+from search_index import search_index
+from summary_extractor import _get_default_summary, generate_summary_from_first_page
 
 router = APIRouter()
-client = get_chroma_client()
-collection = client.get_or_create_collection(config.CHROMA_COLLECTION)
-summary_collection = client.get_or_create_collection(config.SUMMARIES_COLLECTION)
 
-# Initialize SentenceTransformer model
-embedding_model = SentenceTransformer("sentence-transformers/all-mpnet-base-v2")
 genai.configure(api_key=config.GEMINI_API_KEY)
 
 SUMMARY_MODEL = "gemini-2.5-flash"
 SUMMARY_MAX_CHARS = 8000  # Trim very large PDFs to keep prompt size reasonable
+UPLOAD_READ_BLOCK = 1 << 20  # bytes read from the request per step while spooling
+
+# Extraction, embedding and summarisation run here, off the event loop
+ingestion_queue = JobQueue(
+    workers=config.INGEST_WORKERS,
+    max_pending=config.INGEST_QUEUE_SIZE,
+    ttl_seconds=config.INGEST_JOB_TTL_SECONDS,
+    name="ingest-worker",
+    # Job status is shared through Redis when REDIS_URL is set, so any worker can answer a poll
+    backend=RedisCacheBackend(
+        registry.redis_client,
+        namespace=f"{config.REDIS_KEY_PREFIX}:job",
+        ttl_seconds=config.INGEST_JOB_TTL_SECONDS,
+    ) if registry.redis_client else None,
+)
+
+# Upload results of already ingested documents, keyed by content hash
+known_documents = SimpleTTLCache(max_size=1024, ttl_seconds=config.CACHE_TTL_SECONDS, name="known_documents")
+
+# Structured summaries keyed by first-page hash (shared through Redis when REDIS_URL is set)
+summary_cache = SimpleTTLCache(
+    max_size=256,
+    ttl_seconds=config.SUMMARY_CACHE_TTL_SECONDS,
+    backend=RedisCacheBackend(
+        registry.redis_client,
+        namespace=f"{config.REDIS_KEY_PREFIX}:summary",
+        ttl_seconds=config.SUMMARY_CACHE_TTL_SECONDS,
+    ) if registry.redis_client else None,
+    near_ttl_seconds=config.CACHE_NEAR_TTL_SECONDS,
+    name="summary",
+)
+
+# Summary LLM calls run here, alongside the chunk embedding of the same upload
+summary_executor = ThreadPoolExecutor(max_workers=max(1, config.INGEST_WORKERS), thread_name_prefix="summary")
+
+ProgressCallback = Callable[[str, float], None]
+
+
+def _no_progress(stage: str, fraction: float) -> None:
+    pass
+
+
+def get_free_embeddings(texts: List[str]) -> List[List[float]]:
+    """Generate embeddings for a batch of texts, reusing cached chunk vectors"""
+    return embedding_service.encode_documents(texts)
+
+
+def embed_and_store(
+    target_collection,
+    records: Iterable[Tuple[str, str, dict]],
+    on_stored: Optional[Callable[[List[Tuple[str, str, dict]]], None]] = None,
+) -> Tuple[int, float]:
+    """Embed (id, document, metadata) records in batches and upsert them into a collection.
+
+    Records are pulled lazily, one batch at a time. Writes go through
+    ``chroma_writer`` (size-aware batches, retries) while the next batch is
+    being encoded; at most CHROMA_WRITE_CONCURRENCY batches of one call are
+    awaiting their write, which bounds the records held in memory.
+    ``on_stored`` is called with each batch, in order, once it is written.
+    Returns the number of records stored and the seconds spent.
+    """
+    batch_size = max(1, config.EMBEDDING_BATCH_SIZE)
+    max_pending = max(1, config.CHROMA_WRITE_CONCURRENCY)
+    started = time.perf_counter()
+    pending: Deque[Tuple[Future, List[Tuple[str, str, dict]]]] = deque()
+    stored = 0
+    records = iter(records)
+
+    def finish_oldest() -> None:
+        write, batch = pending.popleft()
+        write.result()
+        if on_stored is not None:
+            on_stored(batch)
 
-def get_free_embedding(text: str):
-    """Generate embeddings using free SentenceTransformers"""
-    return embedding_model.encode(text).tolist()
+    try:
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch:
+                break
+            ids, documents, metadatas = (list(column) for column in zip(*batch))
+            batch_embeddings = get_free_embeddings(documents)
+
+            if len(pending) >= max_pending:
+                finish_oldest()
+            pending.append((chroma_writer.submit(target_collection, ids, documents, batch_embeddings, metadatas), batch))
+            stored += len(batch)
+
+        while pending:
+            finish_oldest()
+    finally:
+        # On failure, let writes already queued finish before the caller reports it
+        for write, _ in pending:
+            write.exception()
+
+    return stored, time.perf_counter() - started
+
+
+def find_existing_document(base_id: str) -> Optional[dict]:
+    """Return the upload result of an already ingested document, if any.
+
+    A document counts as ingested once its summary sections are stored,
+    since they are written last.
+    """
+    cached = known_documents.get(base_id)
+    if cached:
+        return cached
+
+    sections = registry.summary_collection.get(where={"document_base_id": base_id}, include=["metadatas"])
+    section_metadatas = sections.get("metadatas") or []
+    if not section_metadatas:
+        return None
+
+    summary = {}
+    for metadata in sorted(section_metadatas, key=lambda m: m.get("section_index", 0)):
+        section_key = metadata["section_key"]
+        summary[section_key] = {
+            "title": metadata.get("section_title", section_key),
+            "content": metadata.get("section_content", ""),
+        }
+
+    first_section = section_metadatas[0]
+    result = {
+        "id": base_id,
+        "document_id": base_id,
+        "filename": first_section.get("filename"),
+        "upload_date": first_section.get("upload_date"),
+        "file_size": first_section.get("file_size"),
+        "chunks_processed": first_section.get("total_chunks"),
+        "embedding_seconds": None,
+        "chunks_per_second": None,
+        "summary": summary,
+        "chroma_collection": config.CHROMA_COLLECTION,
+        "embedding_model": EMBEDDING_MODEL_NAME,
+        "deduplicated": True,
+    }
+    known_documents.set(base_id, result)
+    return result
 
 
 def generate_structured_summary(first_page_text: str) -> dict:
     """Generate a structured summary from the first page of the PDF"""
-    return generate_summary_from_first_page(first_page_text)
+    cache_key = content_hash(first_page_text.encode("utf-8"))
+    cached = summary_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    summary = generate_summary_from_first_page(first_page_text)
+    if summary != _get_default_summary():  # don't pin a failed generation
+        summary_cache.set(cache_key, summary)
+    return summary
+
+
+def start_summary(first_page_text: str) -> Future:
+    return summary_executor.submit(generate_structured_summary, first_page_text)
 
 
 def flatten_summary_for_embedding(summary: dict) -> List[tuple]:
@@ -45,180 +199,348 @@ def flatten_summary_for_embedding(summary: dict) -> List[tuple]:
         sections.append((key, text))
     return sections
 
-def extract_text_from_pdf(pdf_file: bytes) -> str:
-    """Extract text from PDF file"""
+def open_pdf(pdf_path: str) -> MappedPdf:
+    """Map a spooled PDF for reading; files that cannot be parsed are a 400."""
     try:
-        pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_file))
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
-        return text
+        return MappedPdf(pdf_path)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to extract text from PDF: {str(e)}")
 
-def extract_first_page_from_pdf(pdf_file: bytes) -> str:
-    """Extract text from only the first page of the PDF"""
+
+def inspect_pdf(pdf: MappedPdf) -> Tuple[int, str]:
+    """Page count and first-page text of a mapped PDF; unusable files are a 400."""
     try:
-        pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_file))
-        if len(pdf_reader.pages) == 0:
-            raise HTTPException(status_code=400, detail="PDF has no pages")
-        
-        # Extract first page only
-        first_page = pdf_reader.pages[0]
-        first_page_text = first_page.extract_text()
-        
-        if not first_page_text.strip():
-            raise HTTPException(status_code=400, detail="Could not extract text from first page")
-        
-        return first_page_text
-    except HTTPException:
-        raise
+        page_count = pdf.page_count
+        first_page_text = pdf.extract(0, 1)[0] if page_count else ""
     except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Failed to extract first page from PDF: {str(e)}")
-
-def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
-    """Split text into overlapping chunks"""
-    if len(text) <= chunk_size:
-        return [text]
-    
-    chunks = []
-    start = 0
-    
-    while start < len(text):
-        end = start + chunk_size
-        
-        if end < len(text):
-            # Try to break at sentence boundary
-            sentence_end = text.rfind('. ', start, end)
-            if sentence_end > start:
-                end = sentence_end + 1
-            else:
-                # Break at word boundary
-                word_end = text.rfind(' ', start, end)
-                if word_end > start:
-                    end = word_end
-        
-        chunk = text[start:end].strip()
-        if chunk:
-            chunks.append(chunk)
-        
-        start = end - overlap
-        if start >= len(text):
-            break
-    
-    return chunks
+        raise HTTPException(status_code=400, detail=f"Failed to extract text from PDF: {str(e)}")
 
-@router.post("/upload")
-@router.post("/upload_pdf")  # Backwards compatibility
-async def upload_pdf(
-    file: UploadFile = File(...),
+    if page_count == 0:
+        raise HTTPException(status_code=400, detail="PDF has no pages")
+    # The first page feeds the summary generation
+    if not first_page_text.strip():
+        raise HTTPException(status_code=400, detail="Could not extract text from first page")
+    return page_count, first_page_text
+
+
+class PageStream:
+    """Page texts of a mapped PDF, extracted lazily while they are iterated.
+
+    Only a window of pages is in memory at a time. Tracks the extracted
+    text length and the seconds spent extracting. ``workers`` overrides the
+    extraction pool size (``PDF_EXTRACT_WORKERS``).
+    """
+
+    def __init__(self, pdf: MappedPdf, workers: Optional[int] = None):
+        self.pdf = pdf
+        self.workers = workers
+        self.text_length = 0
+        self.seconds = 0.0
+
+    def __iter__(self) -> Iterator[str]:
+        pages = iter_pdf_pages(self.pdf, workers=self.workers)
+        while True:
+            started = time.perf_counter()
+            try:
+                text = next(pages)
+            except StopIteration:
+                return
+            except Exception as e:
+                raise HTTPException(status_code=400, detail=f"Failed to extract text from PDF: {str(e)}")
+            finally:
+                self.seconds += time.perf_counter() - started
+            self.text_length += len(text) + 1  # pages are joined with a newline
+            yield text
+
+
+def document_metadata(
+    base_id: str,
+    filename: str,
+    file_size: int,
+    page_count: int,
+    uploaded: datetime,
     title: Optional[str] = None,
     category: Optional[str] = None,
     source: Optional[str] = None,
-):
-    """Upload a PDF, chunk + embed it, and return a structured summary."""
+) -> dict:
+    """Metadata shared by every chunk of one document."""
+    return {
+        "filename": filename,
+        "file_type": "pdf",
+        "upload_date": uploaded.isoformat(),
+        "upload_ts": uploaded.replace(tzinfo=timezone.utc).timestamp(),  # numeric, for date filters
+        "title": title or filename,
+        "category": category or "general",
+        "source": source or "upload",
+        "file_size": file_size,
+        "embedding_model": EMBEDDING_MODEL_NAME,
+        "document_base_id": base_id,
+        "total_pages": page_count,
+    }
+
+
+def iter_chunk_records(base_id: str, pages: Iterable[str], base_metadata: dict) -> Iterator[Tuple[str, str, dict]]:
+    """(id, text, metadata) for each token-aware chunk of the pages, lazily."""
+    for i, chunk in enumerate(iter_token_chunks(
+        pages,
+        embedding_service.tokenizer,
+        max_tokens=min(config.CHUNK_MAX_TOKENS, embedding_service.max_tokens),
+        overlap_tokens=config.CHUNK_OVERLAP_TOKENS,
+    )):
+        chunk_metadata = base_metadata.copy()
+        chunk_metadata.update({
+            "chunk_id": i,
+            "chunk_size": len(chunk.text),
+            "token_count": chunk.token_count,
+            "page_number": chunk.page_number,
+            "section": chunk.section,
+        })
+        yield f"{base_id}_chunk_{i}", chunk.text, chunk_metadata
+
+
+def summary_records(
+    base_id: str,
+    summary: dict,
+    base_metadata: dict,
+    total_chunks: int,
+    total_length: int,
+) -> List[Tuple[str, str, dict]]:
+    """(id, text, metadata) for each summary section; written after the chunks."""
+    records = []
+    for idx, (section_key, section_text) in enumerate(flatten_summary_for_embedding(summary)):
+        records.append((f"{base_id}_summary_{idx}", section_text, {
+            "document_base_id": base_id,
+            "section_key": section_key,
+            "section_index": idx,
+            "section_title": summary[section_key].get("title", section_key),
+            "section_content": summary[section_key].get("content", ""),
+            "filename": base_metadata["filename"],
+            "upload_date": base_metadata["upload_date"],
+            "file_size": base_metadata["file_size"],
+            "total_chunks": total_chunks,
+            "total_length": total_length,
+        }))
+    return records
+
+
+def upload_result(base_metadata: dict, chunks_stored: int, summary: dict, embedding_seconds: Optional[float]) -> dict:
+    """Upload response for a freshly ingested document; also remembered in ``known_documents``."""
+    base_id = base_metadata["document_base_id"]
+    chunks_per_second = chunks_stored / embedding_seconds if embedding_seconds else None
+    result = {
+        "id": base_id,
+        "document_id": base_id,
+        "filename": base_metadata["filename"],
+        "upload_date": base_metadata["upload_date"],
+        "file_size": base_metadata["file_size"],
+        "chunks_processed": chunks_stored,
+        "embedding_seconds": round(embedding_seconds, 3) if embedding_seconds is not None else None,
+        "chunks_per_second": round(chunks_per_second, 2) if chunks_per_second else None,
+        "summary": summary,
+        "chroma_collection": config.CHROMA_COLLECTION,
+        "embedding_model": EMBEDDING_MODEL_NAME,
+        "deduplicated": False,
+    }
+    known_documents.set(base_id, dict(result, embedding_seconds=None, chunks_per_second=None, deduplicated=True))
+    return result
+
+
+def ingest_pdf(
+    pdf_path: str,
+    filename: str,
+    title: Optional[str] = None,
+    category: Optional[str] = None,
+    source: Optional[str] = None,
+    progress: ProgressCallback = _no_progress,
+    document_id: Optional[str] = None,
+) -> dict:
+    """Extract, chunk, embed and summarise a PDF file; return the upload result.
+
+    Documents are keyed by the hash of their bytes, so re-uploading a known
+    PDF returns its existing document id and summary without any new work.
+    Pages stream from the file through the chunker into embedding batches,
+    so memory stays bounded by the page window and batch size rather than
+    the size of the PDF.
+    """
+
+    base_id = document_id or file_content_hash(pdf_path)
+    existing = find_existing_document(base_id)
+    if existing:
+        return existing
+
+    def index_lexically(batch: List[Tuple[str, str, dict]]) -> None:
+        # Stored chunks become searchable by keyword too (/query)
+        with timed("lexical_index"):
+            search_index.add_many(batch)
+
+    progress("extracting", 0.0)
+    # One parse of the file serves the page count, first page and page stream
+    with open_pdf(pdf_path) as pdf:
+        page_count, first_page_text = inspect_pdf(pdf)
+        # The summary only needs the first page: start it now so it overlaps
+        # extraction and chunk embedding instead of following them
+        summary_future = start_summary(first_page_text)
+
+        base_metadata = document_metadata(
+            base_id, filename, os.path.getsize(pdf_path), page_count, datetime.utcnow(), title, category, source
+        )
+        pages = PageStream(pdf)
+
+        def chunk_records() -> Iterator[Tuple[str, str, dict]]:
+            for record in iter_chunk_records(base_id, pages, base_metadata):
+                progress("embedding", 0.1 + 0.6 * (record[2]["page_number"] - 1) / page_count)
+                yield record
+
+        # Pages stream through the chunker straight into the embedding batches
+        progress("embedding", 0.1)
+        with timed("embed_store"):
+            chunks_stored, embedding_seconds = embed_and_store(registry.collection, chunk_records(), index_lexically)
+        record_stage("extract", pages.seconds)
+
+    if not chunks_stored:
+        raise HTTPException(status_code=400, detail="No text could be extracted from the PDF")
+
+    # Join the summary generated from the first page while chunks were embedded
+    progress("summarising", 0.7)
+    with timed("summary_wait"):
+        summary = summary_future.result()
+
+    # Store summary embeddings in dedicated collection for faster familiarization
+    progress("storing_summary", 0.9)
+    summary_section_records = summary_records(base_id, summary, base_metadata, chunks_stored, pages.text_length)
+    if summary_section_records:
+        with timed("summary_store"):
+            embed_and_store(registry.summary_collection, summary_section_records)
+
+    return upload_result(base_metadata, chunks_stored, summary, embedding_seconds)
+
+
+@dataclass
+class SpooledUpload:
+    """An uploaded PDF written to a temporary file, with its content hash."""
+
+    path: str
+    size: int
+    document_id: str
+
+    def discard(self) -> None:
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
 
+
+async def spool_upload(file: UploadFile) -> SpooledUpload:
+    """Copy the upload to a temporary file block by block, hashing as it goes."""
     if not file.filename.lower().endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
 
+    digest = hashlib.sha256()
+    size = 0
+    spool = tempfile.NamedTemporaryFile(prefix="upload-", suffix=".pdf", dir=config.UPLOAD_SPOOL_DIR, delete=False)
     try:
-        pdf_content = await file.read()
-        full_text = extract_text_from_pdf(pdf_content)
-
-        if not full_text.strip():
-            raise HTTPException(status_code=400, detail="No text could be extracted from the PDF")
-
-        # Extract first page for summary generation
-        first_page_text = extract_first_page_from_pdf(pdf_content)
-
-        base_id = str(uuid.uuid4())
-        uploaded_at = datetime.utcnow().isoformat()
-
-        base_metadata = {
-            "filename": file.filename,
-            "file_type": "pdf",
-            "upload_date": uploaded_at,
-            "title": title or file.filename,
-            "category": category or "general",
-            "source": source or "upload",
-            "total_length": len(full_text),
-            "embedding_model": "sentence-transformers/all-mpnet-base-v2",
-            "document_base_id": base_id,
-        }
+        with spool:
+            while True:
+                block = await file.read(UPLOAD_READ_BLOCK)
+                if not block:
+                    break
+                digest.update(block)
+                size += len(block)
+                await run_in_threadpool(spool.write, block)
+    except BaseException:
+        os.unlink(spool.name)
+        raise
+    return SpooledUpload(path=spool.name, size=size, document_id=digest.hexdigest())
+
+
+def ingest_spooled(
+    upload: SpooledUpload,
+    filename: str,
+    title: Optional[str],
+    category: Optional[str],
+    source: Optional[str],
+    progress: ProgressCallback = _no_progress,
+) -> dict:
+    """Job body: ingest a spooled upload, then delete its temporary file."""
+    try:
+        return ingest_pdf(upload.path, filename, title, category, source, progress, document_id=upload.document_id)
+    finally:
+        upload.discard()
+
+
+async def start_ingestion(
+    file: UploadFile,
+    title: Optional[str],
+    category: Optional[str],
+    source: Optional[str],
+) -> Tuple[Optional[dict], Optional[str]]:
+    """Spool the upload and queue it: ``(existing_result, None)`` or ``(None, job_id)``.
+
+    The job owns the spooled file once queued; otherwise it is removed here.
+    """
+    upload = await spool_upload(file)
+    queued = False
+    try:
+        existing = await run_in_threadpool(find_existing_document, upload.document_id)
+        if existing:
+            return existing, None
+        try:
+            job_id = ingestion_queue.submit(ingest_spooled, upload, file.filename, title, category, source)
+        except JobQueueFull:
+            raise HTTPException(status_code=503, detail="Ingestion queue is full, retry shortly")
+        queued = True
+        return None, job_id
+    finally:
+        if not queued:
+            upload.discard()
 
-        text_chunks = chunk_text(full_text)
-
-        documents = []
-        embeddings = []
-        ids = []
-        metadatas = []
-
-        for i, chunk in enumerate(text_chunks):
-            embedding = get_free_embedding(chunk)
-            chunk_metadata = base_metadata.copy()
-            chunk_metadata.update({
-                "chunk_id": i,
-                "chunk_size": len(chunk),
-                "total_chunks": len(text_chunks),
-            })
-
-            documents.append(chunk)
-            embeddings.append(embedding)
-            ids.append(f"{base_id}_chunk_{i}")
-            metadatas.append(chunk_metadata)
-
-        if not documents:
-            raise HTTPException(status_code=500, detail="Failed to process any chunks from the PDF")
-
-        collection.add(
-            documents=documents,
-            embeddings=embeddings,
-            ids=ids,
-            metadatas=metadatas,
-        )
 
-        # Generate summary from first page only
-        summary = generate_structured_summary(first_page_text)
-
-        # Store summary embeddings in dedicated collection for faster familiarization
-        summary_sections = flatten_summary_for_embedding(summary)
-        summary_docs = []
-        summary_embeddings = []
-        summary_ids = []
-        summary_metadatas = []
-
-        for idx, (section_key, section_text) in enumerate(summary_sections):
-            summary_docs.append(section_text)
-            summary_embeddings.append(get_free_embedding(section_text))
-            summary_ids.append(f"{base_id}_summary_{idx}")
-            summary_metadatas.append({
-                "document_base_id": base_id,
-                "section_key": section_key,
-                "filename": file.filename,
-                "upload_date": uploaded_at,
-            })
-
-        if summary_docs:
-            summary_collection.add(
-                documents=summary_docs,
-                embeddings=summary_embeddings,
-                ids=summary_ids,
-                metadatas=summary_metadatas,
-            )
-
-        return {
-            "id": base_id,
-            "document_id": base_id,
-            "filename": file.filename,
-            "upload_date": uploaded_at,
-            "file_size": len(pdf_content),
-            "chunks_processed": len(documents),
-            "summary": summary,
-            "chroma_collection": config.CHROMA_COLLECTION,
-            "embedding_model": "sentence-transformers/all-mpnet-base-v2",
-        }
+@router.post("/upload")
+@router.post("/upload_pdf")  # Backwards compatibility
+async def upload_pdf(
+    file: UploadFile = File(...),
+    title: Optional[str] = None,
+    category: Optional[str] = None,
+    source: Optional[str] = None,
+):
+    """Upload a PDF, chunk + embed it, and return a structured summary."""
 
+    try:
+        existing, job_id = await start_ingestion(file, title, category, source)
+        if existing:
+            return existing
+        # Shielded: a client that disconnects must not cancel the job's future
+        return await asyncio.shield(asyncio.wrap_future(ingestion_queue.future(job_id)))
     except HTTPException:
         raise
+    except ChromaWriteError as e:
+        # Writes are idempotent upserts and embeddings are cached, so a retry is cheap
+        raise HTTPException(status_code=503, detail=f"Chroma Cloud is unavailable, retry the upload: {str(e)}")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to upload to Chroma Cloud: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to upload to Chroma Cloud: {str(e)}")
+
+
+@router.post("/jobs", status_code=202)
+async def submit_upload_job(
+    file: UploadFile = File(...),
+    title: Optional[str] = None,
+    category: Optional[str] = None,
+    source: Optional[str] = None,
+):
+    """Accept a PDF for background ingestion and return its job id."""
+
+    existing, job_id = await start_ingestion(file, title, category, source)
+    if existing:
+        return {"job_id": None, "status": "completed", "document_id": existing["document_id"], "result": existing}
+
+    return {"job_id": job_id, "status": "queued", "status_url": f"/documents/jobs/{job_id}"}
+
+
+@router.get("/jobs/{job_id}")
+def get_upload_job(job_id: str):
+    """Status and progress of an ingestion job; includes the summary once completed."""
+
+    job = ingestion_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job
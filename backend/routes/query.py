@@ -1,22 +1,126 @@
+import asyncio
+from datetime import date, datetime, time, timedelta, timezone
+from typing import List, Optional
+
 from fastapi import APIRouter
 from pydantic import BaseModel
-from db import get_chroma_client
-from embeddings import get_embedding
+
 import config
+from embedding_service import embedding_service
+from metrics import timed
+from registry import registry
+from search_index import SearchFilters, reciprocal_rank_fusion, search_index
 
 router = APIRouter()
-client = get_chroma_client()
-collection = client.get_or_create_collection(config.CHROMA_COLLECTION)
 
 class Query(BaseModel):
     text: str
-    top_k: int = 3
+    top_k: int = 3  # results per page
+    page: int = 1
+    document_id: Optional[str] = None
+    category: Optional[str] = None
+    source: Optional[str] = None
+    date_from: Optional[date] = None  # upload date, inclusive
+    date_to: Optional[date] = None  # upload date, inclusive
+
+
+def _day_start(day: date) -> float:
+    return datetime.combine(day, time.min, tzinfo=timezone.utc).timestamp()
+
+
+def build_filters(query: Query) -> SearchFilters:
+    return SearchFilters(
+        document_id=query.document_id,
+        category=query.category,
+        source=query.source,
+        date_from=_day_start(query.date_from) if query.date_from else None,
+        date_to=_day_start(query.date_to + timedelta(days=1)) if query.date_to else None,
+    )
+
+
+def lexical_search(text: str, filters: SearchFilters, depth: int) -> List[tuple]:
+    with timed("lexical_search"):
+        return search_index.search(text, filters, depth)
+
+
+def vector_search(text: str, filters: SearchFilters, depth: int) -> dict:
+    """Corpus-wide nearest chunks, embedded with the same model that indexed them."""
+    with timed("embed"):
+        query_embedding = embedding_service.encode_query(text)
+    with timed("vector_search"):
+        results = registry.collection.query(
+            query_embeddings=[query_embedding],
+            n_results=depth,
+            where=filters.chroma_where(),
+            include=["documents", "metadatas", "distances"],
+        )
+    ids = results.get("ids", [[]])[0]
+    documents = results.get("documents", [[]])[0]
+    metadatas = results.get("metadatas", [[]])[0] or [{} for _ in ids]
+    distances = results.get("distances", [[]])[0]
+    return {
+        chunk_id: {"text": document, "metadata": metadata or {}, "distance": distance}
+        for chunk_id, document, metadata, distance in zip(ids, documents, metadatas, distances)
+    }
+
+
+def fetch_chunks(ids: List[str]) -> dict:
+    if not ids:
+        return {}
+    results = registry.collection.get(ids=ids, include=["documents", "metadatas"])
+    return {
+        chunk_id: {"text": document, "metadata": metadata or {}, "distance": None}
+        for chunk_id, document, metadata in zip(results.get("ids") or [], results.get("documents") or [], results.get("metadatas") or [])
+    }
+
 
 @router.post("/query")
-def query_docs(query: Query):
-    embedding = get_embedding(query.text)
-    results = collection.query(
-        query_embeddings=[embedding],
-        n_results=query.top_k
+async def query_docs(query: Query):
+    """Hybrid search over every stored chunk: BM25 and vector rankings fused by reciprocal rank."""
+    page_size = max(1, query.top_k)
+    page = max(1, query.page)
+    filters = build_filters(query)
+    # A fixed depth keeps earlier pages stable while paging forward
+    depth = max(config.SEARCH_CANDIDATE_DEPTH, page * page_size)
+
+    lexical, vector = await asyncio.gather(
+        asyncio.to_thread(lexical_search, query.text, filters, depth),
+        asyncio.to_thread(vector_search, query.text, filters, depth),
     )
-    return {"results": results}
+    lexical_scores = dict(lexical)
+    fused = reciprocal_rank_fusion(
+        [chunk_id for chunk_id, _ in lexical],
+        list(vector),
+        lexical_weight=config.SEARCH_LEXICAL_WEIGHT,
+        k=config.SEARCH_RRF_K,
+    )
+
+    page_items = fused[(page - 1) * page_size : page * page_size]
+    # Lexical-only hits still need their text; fetch just this page's
+    chunks = dict(vector)
+    chunks.update(await asyncio.to_thread(fetch_chunks, [item[0] for item in page_items if item[0] not in chunks]))
+
+    results = []
+    for chunk_id, score, lexical_rank, vector_rank in page_items:
+        chunk = chunks.get(chunk_id)
+        if chunk is None:  # indexed lexically but no longer in Chroma
+            continue
+        results.append({
+            "id": chunk_id,
+            "document_id": chunk["metadata"].get("document_base_id"),
+            "text": chunk["text"],
+            "metadata": chunk["metadata"],
+            "score": score,
+            "bm25_score": lexical_scores.get(chunk_id),
+            "distance": chunk["distance"],
+            "lexical_rank": lexical_rank,
+            "vector_rank": vector_rank,
+        })
+
+    return {
+        "results": results,
+        "page": page,
+        "page_size": page_size,
+        "total_candidates": len(fused),
+        "has_more": page * page_size < len(fused),
+    }
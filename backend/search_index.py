@@ -0,0 +1,256 @@
+"""
+Local BM25 inverted index over chunk text, persisted as an append-only log
+"""
+
+import json
+import math
+import os
+import re
+from array import array
+from collections import Counter
+from dataclasses import dataclass
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+import config
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be been by for from has have in into is it its of on or that the their "
+    "this to was were which with we our".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if len(token) > 1 and token not in STOPWORDS]
+
+
+@dataclass
+class SearchFilters:
+    """Metadata filters shared by the lexical index and the Chroma ``where`` clause."""
+
+    document_id: Optional[str] = None
+    category: Optional[str] = None
+    source: Optional[str] = None
+    date_from: Optional[float] = None  # upload_ts >= date_from
+    date_to: Optional[float] = None  # upload_ts < date_to
+
+    def chroma_where(self) -> Optional[dict]:
+        conditions = []
+        if self.document_id:
+            conditions.append({"document_base_id": self.document_id})
+        if self.category:
+            conditions.append({"category": self.category})
+        if self.source:
+            conditions.append({"source": self.source})
+        if self.date_from is not None:
+            conditions.append({"upload_ts": {"$gte": self.date_from}})
+        if self.date_to is not None:
+            conditions.append({"upload_ts": {"$lt": self.date_to}})
+        if not conditions:
+            return None
+        return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+
+class BM25Index:
+    """Okapi BM25 over chunk text with compact per-term posting arrays.
+
+    Entries are appended to a JSON-lines log at ``path`` and replayed into
+    memory on first use; every search first reads whatever other workers
+    appended since, so all processes converge on the same index. With no
+    ``path`` the index lives in memory only.
+    """
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.lock = Lock()
+        self._offset = 0
+        self.ids: List[str] = []
+        self.positions: Dict[str, int] = {}
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self.lengths = array("I")
+        self.total_length = 0
+        # Filterable metadata, one slot per chunk; strings are interned as codes
+        self.document_codes = array("I")
+        self.category_codes = array("I")
+        self.source_codes = array("I")
+        self.upload_ts = array("d")
+        self._codes: Dict[str, Dict[str, int]] = {"document": {}, "category": {}, "source": {}}
+
+    def _code(self, table: str, value: Optional[str]) -> int:
+        codes = self._codes[table]
+        return codes.setdefault(value or "", len(codes))
+
+    def _apply(self, entry: dict) -> None:
+        if entry["id"] in self.positions:
+            return
+        position = len(self.ids)
+        self.ids.append(entry["id"])
+        self.positions[entry["id"]] = position
+        self.lengths.append(entry["length"])
+        self.total_length += entry["length"]
+        self.document_codes.append(self._code("document", entry.get("document_id")))
+        self.category_codes.append(self._code("category", entry.get("category")))
+        self.source_codes.append(self._code("source", entry.get("source")))
+        self.upload_ts.append(entry.get("upload_ts") or 0.0)
+        for term, frequency in entry["terms"].items():
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = (array("I"), array("H"))
+            posting[0].append(position)
+            posting[1].append(min(frequency, 65535))
+
+    def _sync(self) -> None:
+        """Replay log entries appended since the last read (by this or another process)."""
+        if not self.path or not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as handle:
+            handle.seek(self._offset)
+            for line in handle:
+                if not line.endswith(b"\n"):
+                    break  # a writer is mid-append; pick it up next time
+                self._offset += len(line)
+                self._apply(json.loads(line))
+
+    def add_many(self, records: Iterable[Tuple[str, str, dict]]) -> int:
+        """Index (chunk_id, text, metadata) records; returns how many were new."""
+        entries = []
+        for chunk_id, text, metadata in records:
+            terms = tokenize(text)
+            entries.append({
+                "id": chunk_id,
+                "length": len(terms),
+                "terms": Counter(terms),
+                "document_id": metadata.get("document_base_id"),
+                "category": metadata.get("category"),
+                "source": metadata.get("source"),
+                "upload_ts": metadata.get("upload_ts"),
+            })
+        if not entries:
+            return 0
+
+        with self.lock:
+            before = len(self.ids)
+            if self.path:
+                self._sync()
+                payload = "".join(json.dumps(entry, separators=(",", ":")) + "\n" for entry in entries)
+                with open(self.path, "a", encoding="utf-8") as handle:
+                    handle.write(payload)
+                self._sync()
+            else:
+                for entry in entries:
+                    self._apply(entry)
+            return len(self.ids) - before
+
+    def load(self) -> int:
+        with self.lock:
+            self._sync()
+            return len(self.ids)
+
+    def _filter_mask(self, candidates: np.ndarray, filters: SearchFilters) -> Optional[np.ndarray]:
+        mask = np.ones(len(candidates), dtype=bool)
+        for table, value, codes in (
+            ("document", filters.document_id, self.document_codes),
+            ("category", filters.category, self.category_codes),
+            ("source", filters.source, self.source_codes),
+        ):
+            if value:
+                code = self._codes[table].get(value)
+                if code is None:
+                    return None
+                mask &= np.frombuffer(codes, dtype=np.uint32)[candidates] == code
+        if filters.date_from is not None or filters.date_to is not None:
+            timestamps = np.frombuffer(self.upload_ts, dtype=np.float64)[candidates]
+            if filters.date_from is not None:
+                mask &= timestamps >= filters.date_from
+            if filters.date_to is not None:
+                mask &= timestamps < filters.date_to
+        return mask
+
+    def search(self, query: str, filters: Optional[SearchFilters] = None, limit: int = 100) -> List[Tuple[str, float]]:
+        """Top ``limit`` (chunk_id, bm25_score) pairs matching the filters."""
+        terms = set(tokenize(query))
+        with self.lock:
+            self._sync()
+            count = len(self.ids)
+            if not terms or not count:
+                return []
+
+            average_length = self.total_length / count
+            lengths = np.frombuffer(self.lengths, dtype=np.uint32)
+            scores = np.zeros(count, dtype=np.float32)
+            for term in terms:
+                posting = self.postings.get(term)
+                if posting is None:
+                    continue
+                positions = np.frombuffer(posting[0], dtype=np.uint32)
+                frequencies = np.frombuffer(posting[1], dtype=np.uint16).astype(np.float32)
+                idf = math.log(1 + (count - len(positions) + 0.5) / (len(positions) + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * lengths[positions] / average_length)
+                scores[positions] += idf * frequencies * (self.k1 + 1) / (frequencies + norm)
+
+            candidates = np.flatnonzero(scores)
+            if filters is not None and len(candidates):
+                mask = self._filter_mask(candidates, filters)
+                candidates = candidates[mask] if mask is not None else candidates[:0]
+            if len(candidates) > limit:
+                candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+            order = candidates[np.argsort(-scores[candidates], kind="stable")]
+            return [(self.ids[i], float(scores[i])) for i in order]
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"chunks": len(self.ids), "terms": len(self.postings), "path": self.path}
+
+
+def reciprocal_rank_fusion(
+    lexical_ids: List[str],
+    vector_ids: List[str],
+    lexical_weight: float = 0.5,
+    k: int = 60,
+) -> List[Tuple[str, float, Optional[int], Optional[int]]]:
+    """Fuse two rankings; returns (id, score, lexical_rank, vector_rank) best first."""
+    lexical_ranks = {chunk_id: rank for rank, chunk_id in enumerate(lexical_ids, start=1)}
+    vector_ranks = {chunk_id: rank for rank, chunk_id in enumerate(vector_ids, start=1)}
+    fused = []
+    for chunk_id in dict.fromkeys(lexical_ids + vector_ids):
+        lexical_rank = lexical_ranks.get(chunk_id)
+        vector_rank = vector_ranks.get(chunk_id)
+        score = 0.0
+        if lexical_rank is not None:
+            score += lexical_weight / (k + lexical_rank)
+        if vector_rank is not None:
+            score += (1 - lexical_weight) / (k + vector_rank)
+        fused.append((chunk_id, score, lexical_rank, vector_rank))
+    fused.sort(key=lambda item: item[1], reverse=True)
+    return fused
+
+
+def backfill_from_collection(index: BM25Index, collection, page_size: int = 500) -> int:
+    """Index chunks stored in Chroma before the lexical index existed."""
+    added = 0
+    offset = 0
+    while True:
+        page = collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+        ids = page.get("ids") or []
+        if not ids:
+            break
+        metadatas = page.get("metadatas") or [{} for _ in ids]
+        added += index.add_many(zip(ids, page.get("documents") or [], (metadata or {} for metadata in metadatas)))
+        if len(ids) < page_size:
+            break
+        offset += len(ids)
+    return added
+
+
+search_index = BM25Index(config.SEARCH_INDEX_PATH or None)
+
+
+if __name__ == "__main__":
+    from registry import registry
+
+    print(f"Indexed {backfill_from_collection(search_index, registry.collection)} existing chunks")
@@ -3,9 +3,13 @@ Summary extraction from first page of research papers
 """
 
 import json
+import logging
 from typing import Dict, Optional
 import google.generativeai as genai
 import config
+from metrics import LLM_ERRORS, record_llm_usage, timed
+
+logger = logging.getLogger(__name__)
 
 
 def generate_summary_from_first_page(first_page_text: str) -> Dict:
@@ -68,7 +72,9 @@ First page content:
     
     try:
         model = genai.GenerativeModel("gemini-2.5-flash")
-        response = model.generate_content(prompt)
+        with timed("summary_llm"):
+            response = model.generate_content(prompt)
+        record_llm_usage("summary", response)
         response_text = response.text.strip()
         
         # Remove markdown code blocks if present
@@ -90,10 +96,11 @@ First page content:
         return summary
         
     except json.JSONDecodeError as e:
-        print(f"JSON parsing error: {e}")
+        logger.warning("Summary JSON parsing error: %s", e)
         return _get_default_summary()
     except Exception as e:
-        print(f"Error generating summary: {e}")
+        LLM_ERRORS.inc(call="summary")
+        logger.exception("Error generating summary: %s", e)
         return _get_default_summary()
 
 
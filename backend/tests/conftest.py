@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Modules live flat in backend/ and read their configuration at import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["EMBEDDING_CACHE_PATH"] = ""
+os.environ["SEARCH_INDEX_PATH"] = ""
+os.environ.pop("REDIS_URL", None)
@@ -0,0 +1,10 @@
+import pytest
+from pydantic import ValidationError
+
+from models.chat_models import BatchChatRequest
+
+
+def test_batch_request_needs_at_least_one_question():
+    with pytest.raises(ValidationError):
+        BatchChatRequest(document_id="doc", questions=[])
+    assert BatchChatRequest(document_id="doc", questions=["Why?"]).questions == ["Why?"]
@@ -0,0 +1,60 @@
+import re
+
+import pytest
+
+from chunking import _segments, iter_token_chunks
+
+
+class WhitespaceTokenizer:
+    """One token per word, enough for the chunker's token counting."""
+
+    def __call__(self, text, add_special_tokens=False, return_offsets_mapping=False):
+        if isinstance(text, list):
+            return {"input_ids": [self(item)["input_ids"] for item in text]}
+        offsets = [match.span() for match in re.finditer(r"\S+", text)]
+        encoding = {"input_ids": list(range(len(offsets)))}
+        if return_offsets_mapping:
+            encoding["offset_mapping"] = offsets
+        return encoding
+
+
+@pytest.mark.parametrize(
+    "heading",
+    ["3 Methods", "2.1. Data Collection", "IV. RESULTS", "Abstract", "Related Work", "Results and Discussion", "REFERENCES"],
+)
+def test_headings_are_detected(heading):
+    assert list(_segments(f"{heading}\nWe describe it here.")) == [(heading, "We describe it here.")]
+
+
+@pytest.mark.parametrize(
+    "page",
+    [
+        "We compare against\n12 Baselines drawn from prior work and evaluated on\nthe same splits.",
+        "The corpus has\n40 Languages in total\nand many dialects.",
+        "Our runs used\n3 Seeds for each of\nthe configurations.",
+        "Funding came from\nNASA AND THE EUROPEAN SPACE AGENCY UNDER GRANTS\nlisted below.",
+        "Results show that the model is robust\nacross all the settings.",
+    ],
+)
+def test_wrapped_body_lines_are_not_headings(page):
+    segments = list(_segments(page))
+    assert len(segments) == 1
+    heading, body = segments[0]
+    assert heading is None
+    assert body == " ".join(line.strip() for line in page.splitlines())
+
+
+def test_heading_text_is_kept_in_the_chunk():
+    pages = [
+        "Intro text here.\n3 Methods\nWe train a model. It works.",
+        "4 Results\n",
+        "Accuracy is high.",
+    ]
+    chunks = list(iter_token_chunks(pages, WhitespaceTokenizer(), max_tokens=50, overlap_tokens=0))
+
+    assert [(chunk.text, chunk.page_number, chunk.section) for chunk in chunks] == [
+        ("Intro text here.", 1, ""),
+        ("3 Methods We train a model. It works.", 1, "3 Methods"),
+        ("4 Results Accuracy is high.", 3, "4 Results"),
+    ]
+    assert chunks[1].token_count == 8
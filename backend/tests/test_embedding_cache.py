@@ -0,0 +1,39 @@
+import sqlite3
+
+import numpy as np
+
+from cache import EmbeddingDiskCache
+
+
+def test_inserts_past_max_rows_evict_the_least_recently_used(tmp_path):
+    cache = EmbeddingDiskCache(str(tmp_path / "embeddings.db"), max_rows=3)
+    cache.set_many("model", ["a", "b", "c"], [[1.0], [2.0], [3.0]])
+    assert cache.get_many("model", ["a"]) == [[1.0]]  # "a" is now the most recently used
+
+    cache.set_many("model", ["d", "e"], [[4.0], [5.0]])
+
+    assert cache.get_many("model", ["a", "b", "c", "d", "e"]) == [[1.0], None, None, [4.0], [5.0]]
+    (count,) = cache.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+    assert count == 3
+
+
+def test_unbounded_cache_keeps_every_row(tmp_path):
+    cache = EmbeddingDiskCache(str(tmp_path / "embeddings.db"))
+    cache.set_many("model", [str(index) for index in range(10)], [[float(index)] for index in range(10)])
+    assert None not in cache.get_many("model", [str(index) for index in range(10)])
+
+
+def test_cache_files_from_before_eviction_are_migrated(tmp_path):
+    path = str(tmp_path / "embeddings.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+    conn.execute(
+        "INSERT INTO embeddings VALUES (?, ?)",
+        (EmbeddingDiskCache.make_key("model", "old"), np.float32([0.5]).tobytes()),
+    )
+    conn.commit()
+    conn.close()
+
+    cache = EmbeddingDiskCache(path, max_rows=1)
+    cache.set_many("model", ["new"], [[1.0]])
+    assert cache.get_many("model", ["old", "new"]) == [None, [1.0]]
@@ -0,0 +1,59 @@
+import asyncio
+from threading import Event
+
+from embedding_service import EmbeddingService
+
+
+class GatedEmbeddingService(EmbeddingService):
+    """Encodes texts to their length, blocking each model call until released."""
+
+    def __init__(self):
+        super().__init__(batch_window_ms=5)
+        self.gate = Event()
+        self.entered = Event()
+        self.calls = []
+
+    def encode_batch(self, texts):
+        self.calls.append(list(texts))
+        self.entered.set()
+        assert self.gate.wait(5)
+        return [[float(len(text))] for text in texts]
+
+
+async def _cancel_while_queued(service: EmbeddingService) -> None:
+    # The first call occupies the batcher; the second is cancelled while queued behind it
+    first = asyncio.create_task(service.encode_query_async("first"))
+    assert await asyncio.to_thread(service.entered.wait, 5)
+    second = asyncio.create_task(service.encode_query_async("second"))
+    await asyncio.sleep(0.01)
+    second.cancel()
+    await asyncio.sleep(0.01)
+    service.gate.set()
+    assert await first == [5.0]
+
+
+def test_cancelled_caller_does_not_kill_the_batcher():
+    service = GatedEmbeddingService()
+
+    async def scenario():
+        await _cancel_while_queued(service)
+        return await asyncio.wait_for(service.encode_query_async("after"), timeout=5)
+
+    assert asyncio.run(scenario()) == [5.0]
+    assert service._worker.is_alive()
+    assert ["second"] not in service.calls  # the cancelled text was never encoded
+
+
+def test_cancelled_during_encode_does_not_kill_the_batcher():
+    service = GatedEmbeddingService()
+
+    async def scenario():
+        task = asyncio.create_task(service.encode_query_async("inflight"))
+        assert await asyncio.to_thread(service.entered.wait, 5)
+        task.cancel()
+        await asyncio.sleep(0.01)
+        service.gate.set()
+        return await asyncio.wait_for(service.encode_query_async("after"), timeout=5)
+
+    assert asyncio.run(scenario()) == [5.0]
+    assert service._worker.is_alive()
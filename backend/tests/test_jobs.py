@@ -0,0 +1,86 @@
+import asyncio
+import time
+from threading import Event
+
+import fakeredis
+
+from cache import RedisCacheBackend
+from jobs import JobQueue
+
+
+def wait_for_status(queue: JobQueue, job_id: str, status: str, timeout: float = 5) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job["status"] == status:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} is {queue.get(job_id)['status']}, expected {status}")
+
+
+def echo(value, progress):
+    return value
+
+
+def test_cancelled_waiter_while_queued_does_not_stop_the_worker():
+    queue = JobQueue(workers=1)
+    gate = Event()
+    blocker = queue.submit(lambda progress: gate.wait(5))
+    queued = queue.submit(echo, "queued")
+
+    assert queue.future(queued).cancel()
+    gate.set()
+
+    # The abandoned job still runs and the worker moves on to the next one
+    assert wait_for_status(queue, queued, "completed")["result"] == "queued"
+    after = queue.submit(echo, "after")
+    assert queue.future(after).result(timeout=5) == "after"
+    assert queue.get(blocker)["status"] == "completed"
+
+
+def test_cancelled_await_while_running_does_not_stop_the_worker():
+    queue = JobQueue(workers=1)
+    gate = Event()
+    started = Event()
+
+    def slow(progress):
+        started.set()
+        gate.wait(5)
+        return "slow"
+
+    async def scenario():
+        job_id = queue.submit(slow)
+        waiter = asyncio.ensure_future(asyncio.wrap_future(queue.future(job_id)))
+        assert await asyncio.to_thread(started.wait, 5)
+        waiter.cancel()
+        await asyncio.sleep(0.01)
+        gate.set()
+        return job_id
+
+    job_id = asyncio.run(scenario())
+    assert wait_for_status(queue, job_id, "completed")["result"] == "slow"
+    after = queue.submit(echo, "after")
+    assert queue.future(after).result(timeout=5) == "after"
+
+
+def test_job_status_is_shared_between_processes_through_redis():
+    server = fakeredis.FakeServer()
+
+    def worker_queue():
+        backend = RedisCacheBackend(fakeredis.FakeRedis(server=server), namespace="rag:job", ttl_seconds=60)
+        return JobQueue(workers=1, ttl_seconds=60, backend=backend)
+
+    accepting, polled = worker_queue(), worker_queue()
+    gate = Event()
+
+    def ingest(progress):
+        progress("embedding", 0.5)
+        gate.wait(5)
+        return {"document_id": "doc"}
+
+    job_id = accepting.submit(ingest)
+    assert wait_for_status(polled, job_id, "running")["stage"] in ("started", "embedding")
+    gate.set()
+    assert wait_for_status(polled, job_id, "completed")["result"] == {"document_id": "doc"}
+    assert polled.future(job_id) is None  # only the accepting process can wait on it
+    assert polled.get("missing") is None
@@ -0,0 +1,29 @@
+import asyncio
+import pstats
+
+from metrics import ProfilingExecutor, reset_request_profiles, start_request_profiles
+
+
+def thread_work():
+    return sum(range(1000))
+
+
+def profiled_functions(profiles):
+    return {name for _, _, name in pstats.Stats(*profiles).stats}
+
+
+def test_to_thread_work_is_profiled_only_for_the_profiled_request():
+    async def scenario():
+        asyncio.get_running_loop().set_default_executor(ProfilingExecutor(max_workers=2))
+        await asyncio.to_thread(thread_work)  # not profiled: no request profile is active
+
+        profiles, token = start_request_profiles()
+        try:
+            assert await asyncio.to_thread(thread_work) == 499500
+        finally:
+            reset_request_profiles(token)
+        return profiles
+
+    profiles = asyncio.run(scenario())
+    assert len(profiles) == 1
+    assert "thread_work" in profiled_functions(profiles)
@@ -0,0 +1,150 @@
+import time
+from threading import Thread
+
+import fakeredis
+import pytest
+
+from cache import MemoryStore, RedisCacheBackend, RedisMemoryBackend, SimpleTTLCache
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+def client(server):
+    """A separate connection per worker, sharing one Redis."""
+    return fakeredis.FakeRedis(server=server)
+
+
+def test_cache_backend_round_trip_with_ttl(server):
+    backend = RedisCacheBackend(client(server), namespace="rag:response", ttl_seconds=600)
+    backend.set("doc::question", {"answer": "42", "sources": ["p1"]})
+
+    assert backend.get("doc::question") == {"answer": "42", "sources": ["p1"]}
+    assert backend.get("doc::other") is None
+    assert 0 < client(server).ttl("rag:response:doc::question") <= 600
+
+
+def test_near_cache_serves_locally_and_shares_through_redis(server):
+    def worker_cache():
+        backend = RedisCacheBackend(client(server), namespace="rag:response", ttl_seconds=600)
+        return SimpleTTLCache(ttl_seconds=600, backend=backend, near_ttl_seconds=1)
+
+    first, second = worker_cache(), worker_cache()
+    assert first.cache.ttl == 1  # local copies only live for the near TTL
+
+    first.set("key", "value")
+    assert second.get("key") == "value"  # read through from Redis
+
+    client(server).delete("rag:response:key")
+    assert second.get("key") == "value"  # served from the near cache
+    time.sleep(1.1)
+    assert second.get("key") is None  # near copy expired, Redis no longer has it
+
+
+def memory_backend(server, **limits):
+    options = dict(ttl_seconds=3600, max_messages=4, max_tokens=10_000, summary_max_tokens=100)
+    options.update(limits)
+    return RedisMemoryBackend(client(server), namespace="rag:memory", **options)
+
+
+def test_memory_rolls_evicted_turns_into_the_summary(server):
+    store = MemoryStore(backend=memory_backend(server))
+    store.append_many("c", [("user", "What is the dataset? It is large."), ("assistant", "ImageNet. Mostly.")])
+    store.append_many("c", [("user", "q2"), ("assistant", "a2")])
+    store.append_many("c", [("user", "q3"), ("assistant", "a3")])
+
+    assert store.get_history("c") == [
+        ("summary", "User: What is the dataset? Assistant: ImageNet."),
+        ("user", "q2"),
+        ("assistant", "a2"),
+        ("user", "q3"),
+        ("assistant", "a3"),
+    ]
+
+
+def test_memory_token_budget_and_summary_cap(server):
+    backend = memory_backend(server, max_messages=100, max_tokens=20, summary_max_tokens=12)
+    for index in range(10):
+        backend.append_many("c", [("user", f"Question number {index} about the method section.")])
+
+    history = backend.get_history("c")
+    assert history[0][0] == "summary"
+    assert "Question number 0" not in history[0][1]  # oldest summary lines dropped past the cap
+    assert history[-1] == ("user", "Question number 9 about the method section.")
+    assert len(history) < 11
+
+
+def test_memory_summary_ttl_follows_the_conversation(server):
+    backend = memory_backend(server, ttl_seconds=3600, max_messages=10, max_tokens=20)
+    redis = client(server)
+    backend.append_many("c", [("user", "A long opening question. " * 3), ("assistant", "Short answer.")])
+    assert redis.exists("rag:memory:c:summary")
+    redis.expire("rag:memory:c:summary", 5)
+
+    backend.append_many("c", [("user", "Next?")])  # fits the budget: nothing is evicted
+    assert redis.ttl("rag:memory:c") > 5
+    assert redis.ttl("rag:memory:c:summary") > 5
+
+
+class InterleavedMemoryBackend(RedisMemoryBackend):
+    """Runs another worker's append right after this one reads the list, at the chosen read."""
+
+    def __init__(self, *args, concurrent_append, at_read: int, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.concurrent_append = concurrent_append
+        self.at_read = at_read
+        self.reads = 0
+
+    def _eviction(self, raw_turns, raw_summary):
+        self.reads += 1
+        if self.reads == self.at_read:
+            self.concurrent_append()
+        return super()._eviction(raw_turns, raw_summary)
+
+
+@pytest.mark.parametrize("at_read", [1, 2])  # before the transaction, and inside it under WATCH
+def test_concurrent_append_does_not_over_trim(server, at_read):
+    other = memory_backend(server)
+    other.append_many("c", [("user", "q1"), ("assistant", "a1"), ("user", "q2")])
+    backend = InterleavedMemoryBackend(
+        client(server),
+        namespace="rag:memory",
+        max_messages=4,
+        max_tokens=10_000,
+        concurrent_append=lambda: other.append_many("c", [("assistant", "other")]),
+        at_read=at_read,
+    )
+    backend.append_many("c", [("assistant", "a2"), ("user", "q3")])
+
+    history = backend.get_history("c")
+    assert history[0][0] == "summary"
+    assert len(history[1:]) == 4  # exactly max_messages turns kept
+    assert history[-1] in (("user", "q3"), ("assistant", "other"))
+
+
+def test_concurrent_appends_from_many_workers(server):
+    backends = [memory_backend(server) for _ in range(8)]
+
+    def worker(index, backend):
+        for turn in range(25):
+            backend.append_many("c", [("user", f"u{index}-{turn}"), ("assistant", f"a{index}-{turn}")])
+
+    threads = [Thread(target=worker, args=(index, backend)) for index, backend in enumerate(backends)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    history = backends[0].get_history("c")
+    assert history[0][0] == "summary"
+    assert len(history[1:]) == 4
+
+
+def test_empty_append_is_a_no_op(server):
+    backend = memory_backend(server)
+    backend.append_many("c", [])
+    MemoryStore(backend=backend).append_many("c", [])
+    assert backend.get_history("c") == []
+    assert not client(server).exists("rag:memory:c")
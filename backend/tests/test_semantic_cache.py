@@ -0,0 +1,46 @@
+import time
+
+import numpy as np
+
+from cache import SemanticCache
+
+
+def rotated(angle_degrees: float):
+    """A unit vector at ``angle_degrees`` from [1, 0]: cosine similarity is cos(angle)."""
+    angle = np.radians(angle_degrees)
+    return [float(np.cos(angle)), float(np.sin(angle))]
+
+
+def test_hit_above_the_threshold_and_miss_below_it():
+    cache = SemanticCache(similarity_threshold=0.9)
+    cache.set("doc", [2.0, 0.0], "answer")  # stored normalised
+
+    value, similarity = cache.get("doc", rotated(20))  # cos 20° ≈ 0.94
+    assert value == "answer"
+    assert np.isclose(similarity, np.cos(np.radians(20)))
+
+    value, similarity = cache.get("doc", rotated(30))  # cos 30° ≈ 0.87
+    assert value is None
+    assert np.isclose(similarity, np.cos(np.radians(30)))
+
+    assert cache.get("other-doc", rotated(0)) == (None, None)  # entries are per document
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_closest_entry_wins():
+    cache = SemanticCache(similarity_threshold=0.5)
+    cache.set("doc", rotated(0), "first")
+    cache.set("doc", rotated(40), "second")
+
+    assert cache.get("doc", rotated(30))[0] == "second"
+    assert cache.get("doc", rotated(5))[0] == "first"
+
+
+def test_entries_expire_after_the_ttl():
+    cache = SemanticCache(similarity_threshold=0.9, ttl_seconds=0.2)
+    cache.set("doc", rotated(0), "answer")
+    assert cache.get("doc", rotated(0))[0] == "answer"
+
+    time.sleep(0.3)
+    assert cache.get("doc", rotated(0)) == (None, None)
+    assert not cache.documents["doc"]  # expired entries are dropped on lookup
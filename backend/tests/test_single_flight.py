@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from cache import SingleFlight
+
+
+class Backend:
+    """Counts calls and holds each one until released."""
+
+    def __init__(self, error: Exception = None):
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.error = error
+
+    async def answer(self):
+        self.calls += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return f"answer {self.calls}"
+
+
+async def start_callers(flight: SingleFlight, backend: Backend, count: int):
+    tasks = [asyncio.ensure_future(flight.run("key", backend.answer)) for _ in range(count)]
+    await asyncio.sleep(0)  # let every caller reach the flight
+    backend.release.set()
+    return await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def test_concurrent_callers_share_one_execution():
+    async def scenario():
+        flight, backend = SingleFlight(timeout_seconds=5), Backend()
+        results = await start_callers(flight, backend, 5)
+        return flight, backend, results
+
+    flight, backend, results = asyncio.run(scenario())
+    assert backend.calls == 1
+    assert results == ["answer 1"] * 5
+    assert flight.pending == {}  # the key is released for the next question
+
+
+def test_leader_exception_reaches_every_waiter():
+    error = RuntimeError("LLM unavailable")
+
+    async def scenario():
+        flight, backend = SingleFlight(timeout_seconds=5), Backend(error)
+        results = await start_callers(flight, backend, 4)
+        backend.error = None
+        backend.release.set()
+        retry = await flight.run("key", backend.answer)  # the failure is not cached
+        return flight, backend, results, retry
+
+    flight, backend, results, retry = asyncio.run(scenario())
+    assert results == [error] * 4
+    assert backend.calls == 2
+    assert retry == "answer 2"
+    assert flight.pending == {}
+
+
+@pytest.mark.parametrize("leader_outcome", ["cancelled", "timeout"])
+def test_waiter_answers_on_its_own_without_a_leader_result(leader_outcome):
+    async def scenario():
+        flight, backend = SingleFlight(timeout_seconds=0.05), Backend()
+        leader = asyncio.ensure_future(flight.run("key", backend.answer))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(flight.run("key", lambda: asyncio.sleep(0, "own answer")))
+        await asyncio.sleep(0)
+        if leader_outcome == "cancelled":
+            leader.cancel()
+        result = await waiter
+        backend.release.set()
+        await asyncio.gather(leader, return_exceptions=True)
+        return flight, result
+
+    flight, result = asyncio.run(scenario())
+    assert result == "own answer"
+    assert flight.pending == {}
@@ -0,0 +1,41 @@
+import numpy as np
+
+from vector_index import LocalVectorIndex
+
+
+class FakeCollection:
+    def __init__(self):
+        self.records = []
+
+    def add(self, document_id: str, count: int) -> None:
+        start = len(self.records)
+        for i in range(start, start + count):
+            self.records.append((f"{document_id}_chunk_{i}", f"chunk {i}", [float(i), 0.0]))
+
+    def get(self, where, include, limit, offset):
+        page = self.records[offset : offset + limit]
+        return {
+            "ids": [record_id for record_id, _, _ in page],
+            "documents": [document for _, document, _ in page],
+            "metadatas": [{"document_base_id": where["document_base_id"]} for _ in page],
+            "embeddings": [embedding for _, _, embedding in page],
+        }
+
+
+def test_partially_ingested_document_is_not_cached():
+    collection = FakeCollection()
+    complete = {"doc": False}
+    index = LocalVectorIndex(lambda: collection, is_complete=lambda document_id, vectors: complete[document_id])
+
+    collection.add("doc", 2)
+    assert len(index.get("doc").ids) == 2
+    assert not index.contains("doc")
+
+    collection.add("doc", 3)
+    complete["doc"] = True
+    assert len(index.get("doc").ids) == 5
+    assert index.contains("doc")
+
+    result = index.query("doc", [4.0, 0.0], n_results=1)
+    assert result["ids"] == [["doc_chunk_4"]]
+    assert np.isclose(result["distances"][0][0], 0.0)
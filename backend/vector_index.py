@@ -0,0 +1,193 @@
+"""
+Local in-memory vector index over one Chroma collection, one matrix per document
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+@dataclass
+class DocumentVectors:
+    """All stored vectors of one document as a contiguous float32 matrix."""
+
+    ids: List[str]
+    documents: List[str]
+    metadatas: List[dict]
+    matrix: np.ndarray
+    squared_norms: np.ndarray
+
+    @property
+    def nbytes(self) -> int:
+        text_bytes = sum(len(document) for document in self.documents)
+        return self.matrix.nbytes + self.squared_norms.nbytes + text_bytes
+
+
+class LocalVectorIndex:
+    """Serve per-document top-k queries from memory; Chroma stays the durable store.
+
+    ``collection_provider`` returns the Chroma collection, so the client is
+    only created when the first document is loaded. A document's embeddings
+    are fetched from the collection on first access
+    and kept in an LRU bounded by ``max_bytes``. Distances are squared L2,
+    matching Chroma's default space, so confidence scores are unchanged.
+
+    Documents are written incrementally while they are ingested. When
+    ``is_complete(document_id, vectors)`` is given, a fetch it rejects is
+    served once but not cached, so the next access sees the newer chunks.
+    """
+
+    def __init__(
+        self,
+        collection_provider: Callable[[], Any],
+        max_bytes: int = 256 * 1024 * 1024,
+        page_size: int = 300,
+        is_complete: Optional[Callable[[str, DocumentVectors], bool]] = None,
+    ):
+        self.collection_provider = collection_provider
+        self.is_complete = is_complete
+        self.max_bytes = max_bytes
+        self.page_size = page_size
+        self.documents: "OrderedDict[str, DocumentVectors]" = OrderedDict()
+        self.total_bytes = 0
+        self.lock = Lock()
+        self._load_locks: Dict[str, Lock] = {}
+
+    def _fetch(self, document_id: str) -> Optional[DocumentVectors]:
+        ids: List[str] = []
+        documents: List[str] = []
+        metadatas: List[dict] = []
+        embeddings: List[np.ndarray] = []
+        offset = 0
+        collection = self.collection_provider()
+
+        while True:
+            page = collection.get(
+                where={"document_base_id": document_id},
+                include=["documents", "metadatas", "embeddings"],
+                limit=self.page_size,
+                offset=offset,
+            )
+            page_ids = page.get("ids") or []
+            if not page_ids:
+                break
+            ids.extend(page_ids)
+            documents.extend(page.get("documents") or [])
+            metadatas.extend(page.get("metadatas") or [{} for _ in page_ids])
+            embeddings.append(np.asarray(page.get("embeddings"), dtype=np.float32))
+            if len(page_ids) < self.page_size:
+                break
+            offset += len(page_ids)
+
+        if not ids:
+            return None
+
+        matrix = np.ascontiguousarray(np.concatenate(embeddings, axis=0))
+        return DocumentVectors(
+            ids=ids,
+            documents=documents,
+            metadatas=metadatas,
+            matrix=matrix,
+            squared_norms=np.einsum("ij,ij->i", matrix, matrix),
+        )
+
+    def contains(self, document_id: str) -> bool:
+        with self.lock:
+            return document_id in self.documents
+
+    def get(self, document_id: str) -> Optional[DocumentVectors]:
+        """Return the document's vectors, loading them from Chroma on a miss."""
+        with self.lock:
+            vectors = self.documents.get(document_id)
+            if vectors is not None:
+                self.documents.move_to_end(document_id)
+                return vectors
+            load_lock = self._load_locks.setdefault(document_id, Lock())
+
+        # One loader per document; concurrent callers wait for its result
+        with load_lock:
+            with self.lock:
+                vectors = self.documents.get(document_id)
+            if vectors is None:
+                vectors = self._fetch(document_id)
+                if vectors is not None and (self.is_complete is None or self.is_complete(document_id, vectors)):
+                    self._store(document_id, vectors)
+
+        with self.lock:
+            self._load_locks.pop(document_id, None)
+        return vectors
+
+    def _store(self, document_id: str, vectors: DocumentVectors) -> None:
+        with self.lock:
+            previous = self.documents.pop(document_id, None)
+            if previous is not None:
+                self.total_bytes -= previous.nbytes
+            self.documents[document_id] = vectors
+            self.total_bytes += vectors.nbytes
+            # Always keep the newest document, even if it alone exceeds the budget
+            while self.total_bytes > self.max_bytes and len(self.documents) > 1:
+                _, evicted = self.documents.popitem(last=False)
+                self.total_bytes -= evicted.nbytes
+
+    def query(
+        self,
+        document_id: str,
+        query_embedding: Sequence[float],
+        n_results: int,
+        include_embeddings: bool = False,
+    ) -> dict:
+        """Top-k nearest chunks of one document, shaped like ``collection.query``."""
+        return self.query_many(document_id, [query_embedding], n_results, include_embeddings)
+
+    def query_many(
+        self,
+        document_id: str,
+        query_embeddings: Sequence[Sequence[float]],
+        n_results: int,
+        include_embeddings: bool = False,
+    ) -> dict:
+        """Top-k for several queries at once: one matrix product, one result row per query."""
+        fields = ["ids", "documents", "metadatas", "distances"] + (["embeddings"] if include_embeddings else [])
+        results: Dict[str, list] = {name: [] for name in fields}
+        vectors = self.get(document_id)
+        if vectors is None or n_results <= 0:
+            for name in fields:
+                results[name] = [[] for _ in query_embeddings]
+            return results
+
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), -1)
+        # (documents x queries) squared L2 distances
+        distances = (
+            vectors.squared_norms[:, None]
+            - 2.0 * (vectors.matrix @ queries.T)
+            + np.einsum("ij,ij->i", queries, queries)[None, :]
+        )
+        np.maximum(distances, 0.0, out=distances)
+
+        k = min(n_results, len(vectors.ids))
+        for column in range(queries.shape[0]):
+            row = distances[:, column]
+            if k < len(vectors.ids):
+                candidates = np.argpartition(row, k - 1)[:k]
+            else:
+                candidates = np.arange(len(vectors.ids))
+            order = candidates[np.argsort(row[candidates], kind="stable")]
+
+            results["ids"].append([vectors.ids[i] for i in order])
+            results["documents"].append([vectors.documents[i] for i in order])
+            results["metadatas"].append([vectors.metadatas[i] for i in order])
+            results["distances"].append([float(row[i]) for i in order])
+            if include_embeddings:
+                results["embeddings"].append(vectors.matrix[order])
+        return results
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "documents": len(self.documents),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+            }